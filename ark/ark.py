@@ -1,4 +1,6 @@
 import reflex as rx
+from starlette.applications import Starlette
+from starlette.routing import Route
 from ark.components.navigation.nav import navbar
 from ark.components.chat.hero import hero, input_section
 from ark.pages.changelog import changelog_entry, changelog_header, load_changelog_data
@@ -7,6 +9,9 @@ from ark.state import State
 import reflex_clerk_api as clerk
 import os
 from ark.pages.history import history_nav
+from ark.database.utils import pool_lifespan
+from ark.providers.catalog import catalog_lifespan
+from ark.services.metrics import metrics_endpoint
 
 
 @rx.page(route="/", title="Ark - Chat | Search | Learn")
@@ -85,7 +90,11 @@ style = {
 }
 
 
+# Extra backend endpoints: Prometheus scrapes /metrics with METRICS_TOKEN
+api = Starlette(routes=[Route("/metrics", metrics_endpoint)])
+
 app = rx.App(
+    api_transformer=api,
     style=style,
     stylesheets=["/fonts/fonts.css"],
     theme=rx.theme(
@@ -103,6 +112,12 @@ app = rx.App(
     ],
 )
 
+# Open the shared database pool with the backend and close it on shutdown
+app.register_lifespan_task(pool_lifespan)
+
+# Refresh the model catalog in the background; startup serves the cached copy
+app.register_lifespan_task(catalog_lifespan)
+
 # Register authentication change handler
 clerk.register_on_auth_change_handler(State.handle_auth_change)
 
@@ -156,8 +156,37 @@ def loading_skeleton() -> rx.Component:
     )
 
 
+def model_picker(model_name: str, model_options: Any) -> rx.Component:
+    """
+    Model badge that opens a menu of catalog models.
+
+    Args:
+        model_name: Name of the selected model
+        model_options: List of {"id", "name"} dicts to choose from
+    """
+    return rx.menu.root(
+        rx.menu.trigger(
+            rx.box(model_badge(model_name), class_name="cursor-pointer"),
+        ),
+        rx.menu.content(
+            rx.foreach(
+                model_options,
+                lambda option: rx.menu.item(
+                    option["name"],
+                    on_click=State.set_provider_and_model("openrouter", option["id"]),
+                    class_name="font-[dm]",
+                ),
+            ),
+            class_name="max-h-96 overflow-y-auto",
+        ),
+    )
+
+
 def navigation_header(
-    provider_name: str, model_name: str, new_chat_handler: Any = None
+    provider_name: str,
+    model_name: str,
+    new_chat_handler: Any = None,
+    model_options: Any = None,
 ) -> rx.Component:
     """
     Reusable navigation header component.
@@ -166,6 +195,7 @@ def navigation_header(
         provider_name: Current provider name
         model_name: Current model name
         new_chat_handler: Handler for new chat button
+        model_options: Models to offer in a picker (default: plain badge)
     """
     return rx.hstack(
         # Left side - empty with flex-1 to take equal space
@@ -173,7 +203,9 @@ def navigation_header(
         # Middle - Model provider section
         rx.flex(
             provider_badge(provider_name),
-            model_badge(model_name),
+            model_badge(model_name)
+            if model_options is None
+            else model_picker(model_name, model_options),
             class_name="gap-2 md:gap-4",
         ),
         # Right side - New Chat button with flex-1 and flex-end to align right
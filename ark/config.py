@@ -3,6 +3,9 @@ Configuration constants and settings for the Ark application.
 """
 
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 
 # Environment Variables
@@ -24,25 +27,131 @@ class ModelConfig:
 # Provider Configurations
 class ProviderConfig:
     OPENROUTER = {
-        "base_url": "https://openrouter.ai/api/v1",
+        "base_url": os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
         "default_model": "google/gemini-2.0-flash-001",
-        "available_models": [
-            "google/gemini-2.0-flash-001",
-            "perplexity/sonar",
-            "anthropic/claude-3.5-sonnet",
-            "openai/gpt-4",
-        ],
     }
 
 
+# Model Catalog Configuration
+class ModelCatalogConfig:
+    # Last-known /models response, served at startup before any refresh
+    CACHE_PATH = os.getenv("MODEL_CATALOG_PATH", ".cache/models.json")
+    REFRESH_INTERVAL_SECONDS = int(os.getenv("MODEL_CATALOG_REFRESH_SECONDS", "21600"))
+    RETRY_SECONDS = 300
+
+
+# Provider Resilience Configuration
+class ResilienceConfig:
+    # Retries per target for transient errors (connection, timeout, 429, 5xx)
+    MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+    BACKOFF_BASE_MS = 250
+    BACKOFF_MAX_MS = 4000
+    # Targets tried in order after the requested one fails, as
+    # "provider:model,provider:model"
+    FALLBACK_CHAIN = os.getenv(
+        "PROVIDER_FALLBACK_CHAIN", "openrouter:google/gemini-2.0-flash-001"
+    )
+    # Hedging: if a stream has no first token after the target's p95
+    # time-to-first-token, fire a second identical request and keep the faster
+    HEDGE_REQUESTS = os.getenv("PROVIDER_HEDGE_REQUESTS", "false").lower() == "true"
+    HEDGE_PERCENTILE = 0.95
+    HEDGE_DEFAULT_DELAY_MS = 3000  # until enough latency samples exist
+    # Circuit breaker: skip a target after this many consecutive failures
+    BREAKER_FAILURE_THRESHOLD = 5
+    BREAKER_RESET_SECONDS = 30
+
+
+# Response Cache Configuration
+class ResponseCacheConfig:
+    # Opt-in: identical text-only requests to the same model replay a stored answer
+    ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    # "memory" (per process) or "postgres" (shared response_cache table)
+    BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+    # Search results go stale quickly
+    SEARCH_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_SEARCH_TTL_SECONDS", "3600"))
+    MAX_ENTRIES = 1000
+
+
+# Context Window Configuration
+class ContextConfig:
+    # Known context windows in tokens; other models use DEFAULT_CONTEXT_TOKENS
+    CONTEXT_WINDOWS = {
+        "google/gemini-2.5-flash": 1048576,
+        "google/gemini-2.0-flash-001": 1048576,
+        "perplexity/sonar-pro": 200000,
+        "perplexity/sonar": 127072,
+        "anthropic/claude-3.5-sonnet": 200000,
+        "openai/gpt-4": 8191,
+    }
+    DEFAULT_CONTEXT_TOKENS = 128000
+    # Tokens left free for the model's reply
+    RESERVED_OUTPUT_TOKENS = 8192
+    # Upper bound on prompt tokens per request, however large the model's window
+    MAX_PROMPT_TOKENS = int(os.getenv("CONTEXT_MAX_PROMPT_TOKENS", "100000"))
+    # Attachments in the latest N user turns are sent in full; older ones
+    # are replaced with a short reference
+    KEEP_ATTACHMENT_TURNS = 1
+
 
 # Database Configuration
 class DatabaseConfig:
     DEFAULT_CHAT_LIMIT = 50
     DEFAULT_CHAT_OFFSET = 0
+    SEARCH_PAGE_SIZE = 20
+    # Messages loaded when a chat opens, and per "load earlier" page
+    MESSAGE_PAGE_SIZE = int(os.getenv("CHAT_MESSAGE_PAGE_SIZE", "50"))
     DEFAULT_INITIAL_PROVIDER = "openrouter"
     DEFAULT_INITIAL_MODEL = "google/gemini-2.5-flash"
 
+    # Connection pool (shared by every helper in ark.database)
+    POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+    # Set to 0 when connecting through a transaction-mode pgbouncer endpoint
+    STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+
+# R2 Storage Configuration
+class R2Config:
+    # Worker threads for async R2 calls; bounds concurrent blocking boto3 requests
+    MAX_WORKERS = int(os.getenv("R2_MAX_WORKERS", "8"))
+    # HTTP connections kept alive by the shared boto3 client
+    MAX_POOL_CONNECTIONS = int(os.getenv("R2_MAX_POOL_CONNECTIONS", "16"))
+    CONNECT_TIMEOUT = 5
+    READ_TIMEOUT = 60
+    # Streaming uploads: files larger than one part go up as a multipart upload.
+    # Peak memory per upload is about PART_SIZE * (CONCURRENCY + 1).
+    MULTIPART_PART_SIZE = int(os.getenv("R2_MULTIPART_PART_SIZE_MB", "8")) * 1024 * 1024
+    MULTIPART_CONCURRENCY = int(os.getenv("R2_MULTIPART_CONCURRENCY", "4"))
+    # Presigned URLs are cached and reused while more than this fraction of
+    # their lifetime remains, so browsers see a stable URL they can cache
+    PRESIGNED_URL_CACHE_SIZE = int(os.getenv("R2_PRESIGNED_URL_CACHE_SIZE", "2048"))
+    PRESIGNED_URL_MIN_REMAINING = 0.5
+
+
+# Local PDF Cache Configuration
+class PdfCacheConfig:
+    # Raw PDF bytes on disk, so follow-up turns don't download from R2 again
+    CACHE_DIR = os.getenv("PDF_CACHE_DIR", ".cache/pdf")
+    MAX_DISK_BYTES = int(os.getenv("PDF_CACHE_MAX_DISK_MB", "1024")) * 1024 * 1024
+    # Encoded data URLs kept in memory for the hottest PDFs
+    MAX_MEMORY_BYTES = int(os.getenv("PDF_CACHE_MAX_MEMORY_MB", "128")) * 1024 * 1024
+
+
+# Streaming Configuration
+class StreamingConfig:
+    # Coalesce token deltas and push to the UI at most every FLUSH_INTERVAL_MS,
+    # or sooner once FLUSH_CHARS new characters have accumulated
+    FLUSH_INTERVAL_MS = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50"))
+    FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "200"))
+
+
+# Metrics Configuration
+class MetricsConfig:
+    # Bearer token Prometheus must send to /metrics; the endpoint is off when unset
+    TOKEN = os.getenv("METRICS_TOKEN", "")
+
 
 # Application Configuration
 class AppConfig:
@@ -7,15 +7,23 @@ logger = logging.getLogger(__name__)
 
 
 async def store_file_metadata(
-    conn: asyncpg.Connection, file_data: Dict[str, Any], chat_id: Optional[UUID] = None
+    conn: asyncpg.Connection,
+    file_data: Dict[str, Any],
+    chat_id: Optional[UUID] = None,
+    message_order: Optional[int] = None,
 ) -> Optional[UUID]:
     """
     Store file metadata in the database
 
+    Attaching the same content to a chat twice reuses the existing row. The
+    insert holds the file key's lock (see lock_file_keys), so it can't
+    interleave with a ref-counted delete of the same R2 object.
+
     Args:
         conn: Database connection
         file_data: File metadata from R2 upload
         chat_id: Optional chat ID to associate file with
+        message_order: Order of the user message the file was sent with
 
     Returns:
         File UUID if successful, None otherwise
@@ -23,8 +31,13 @@ async def store_file_metadata(
     try:
         file_id = await conn.fetchval(
             """
-            INSERT INTO files (file_key, original_filename, content_type, file_size, user_id, chat_id)
-            VALUES ($1, $2, $3, $4, $5, $6)
+            WITH key_lock AS (SELECT pg_advisory_xact_lock(hashtext($1)))
+            INSERT INTO files (file_key, original_filename, content_type, file_size, user_id, chat_id, content_hash, message_order)
+            SELECT $1::varchar, $2::varchar, $3::varchar, $4::bigint, $5::varchar, $6::uuid, $7::char(64), $8::int
+            FROM key_lock
+            ON CONFLICT (chat_id, content_hash) DO UPDATE
+            SET file_key = EXCLUDED.file_key,
+                message_order = COALESCE(files.message_order, EXCLUDED.message_order)
             RETURNING id
             """,
             file_data["file_key"],
@@ -33,6 +46,8 @@ async def store_file_metadata(
             file_data.get("file_size", file_data.get("size", 0)),
             file_data.get("user_id"),
             chat_id,
+            file_data.get("content_hash"),
+            message_order,
         )
         return file_id
     except Exception as e:
@@ -56,7 +71,7 @@ async def get_chat_files(
     try:
         rows = await conn.fetch(
             """
-            SELECT id, file_key, original_filename, content_type, file_size, created_at
+            SELECT id, file_key, original_filename, content_type, file_size, content_hash, created_at
             FROM files
             WHERE chat_id = $1
             ORDER BY created_at ASC
@@ -156,3 +171,84 @@ async def get_user_file_keys(conn: asyncpg.Connection, user_id: str) -> List[str
     except Exception as e:
         logger.error(f"Error fetching user file keys: {e}")
         return []
+
+
+async def get_files_by_keys(
+    conn: asyncpg.Connection, file_keys: List[str]
+) -> List[Dict[str, Any]]:
+    """
+    Get one files row per referenced key (for restoring deleted R2 objects)
+
+    Args:
+        conn: Database connection
+        file_keys: R2 object keys
+
+    Returns:
+        List of dicts with file_key, content_hash and content_type
+    """
+    if not file_keys:
+        return []
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT DISTINCT ON (file_key) file_key, content_hash, content_type
+            FROM files WHERE file_key = ANY($1::text[])
+            """,
+            file_keys,
+        )
+        return [dict(row) for row in rows]
+    except Exception as e:
+        logger.error(f"Error fetching files by key: {e}")
+        return []
+
+
+async def lock_file_keys(conn: asyncpg.Connection, file_keys: List[str]):
+    """
+    Take transaction-scoped advisory locks on R2 object keys
+
+    Must run inside a transaction. Keys are locked in sorted order so two
+    callers with overlapping keys can't deadlock.
+
+    Args:
+        conn: Database connection in a transaction
+        file_keys: R2 object keys
+    """
+    await conn.execute(
+        """
+        SELECT pg_advisory_xact_lock(hashtext(key))
+        FROM (SELECT DISTINCT key FROM unnest($1::text[]) AS key ORDER BY key) keys
+        """,
+        file_keys,
+    )
+
+
+async def get_unreferenced_file_keys(
+    conn: asyncpg.Connection, file_keys: List[str]
+) -> List[str]:
+    """
+    Filter file keys down to those no files row references any more
+
+    R2 objects are content-addressed and shared between chats, so only these
+    keys are safe to delete from storage.
+
+    Args:
+        conn: Database connection
+        file_keys: Candidate R2 object keys
+
+    Returns:
+        List of file keys without remaining references
+    """
+    if not file_keys:
+        return []
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT DISTINCT key FROM unnest($1::text[]) AS key
+            WHERE NOT EXISTS (SELECT 1 FROM files WHERE files.file_key = key)
+            """,
+            file_keys,
+        )
+        return [row["key"] for row in rows]
+    except Exception as e:
+        logger.error(f"Error checking file key references: {e}")
+        return []
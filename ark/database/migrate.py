@@ -0,0 +1,150 @@
+"""
+Apply the numbered schema migrations in ark/database/migrations.
+
+Run at deploy, before the app starts: python -m ark.database.migrate
+
+Migrations are NNNN_name.sql files, or NNNN_name.py modules defining
+`async def upgrade(conn)`. Each runs in its own transaction and is recorded
+in schema_migrations; a .sql file whose first line is
+`-- migrate: no-transaction`, or a module setting `TRANSACTIONAL = False`,
+runs outside one (for CREATE INDEX CONCURRENTLY and batched backfills) and
+must be safe to run again after a partial failure.
+A Postgres advisory lock keeps concurrent deploys from applying the same
+migration twice.
+"""
+import asyncio
+import importlib
+import os
+import re
+from pathlib import Path
+from typing import List, NamedTuple
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+DB_URL = os.getenv("NEON_DB_URL")
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+NO_TRANSACTION = "-- migrate: no-transaction"
+LOCK_NAME = "ark.schema_migrations"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def transactional(self) -> bool:
+        if self.path.suffix != ".sql":
+            return getattr(self.module(), "TRANSACTIONAL", True)
+        with self.path.open() as f:
+            return f.readline().strip() != NO_TRANSACTION
+
+    def module(self):
+        return importlib.import_module(f"{__package__}.migrations.{self.path.stem}")
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Migrations in a directory, ordered by version
+
+    Raises:
+        ValueError: If two migrations share a version number
+    """
+    migrations = {}
+    for path in directory.iterdir():
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(
+                f"Duplicate migration version {version}: {migrations[version].path.name}, {path.name}"
+            )
+        migrations[version] = Migration(version, match.group(2), path)
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def create_index_concurrently(conn: asyncpg.Connection, name: str, definition: str):
+    """
+    CREATE INDEX CONCURRENTLY that can be retried
+
+    A failed concurrent build leaves an INVALID index behind, which
+    IF NOT EXISTS would then skip; drop it first so the retry rebuilds it.
+    Must run outside a transaction.
+
+    Args:
+        conn: Database connection
+        name: Index name
+        definition: Everything after ON, e.g. "chats (user_id)"
+    """
+    valid = await conn.fetchval(
+        "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1::text)", name
+    )
+    if valid is False:
+        print(f"Dropping invalid index {name} left by an earlier run")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    await conn.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+async def _apply(conn: asyncpg.Connection, migration: Migration):
+    if migration.path.suffix == ".sql":
+        await conn.execute(migration.path.read_text())
+    else:
+        await migration.module().upgrade(conn)
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+        migration.version, migration.name
+    )
+
+
+async def migrate(db_url: str = DB_URL) -> int:
+    """
+    Apply all pending migrations
+
+    Returns:
+        Number of migrations applied
+    """
+    conn = await asyncpg.connect(db_url)
+    try:
+        # Held for the whole run: other deploys wait here, then find nothing pending
+        await conn.execute("SELECT pg_advisory_lock(hashtext($1))", LOCK_NAME)
+        try:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMPTZ DEFAULT NOW()
+                )
+                """
+            )
+            applied = {
+                row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations")
+            }
+            pending = [m for m in discover_migrations() if m.version not in applied]
+
+            for migration in pending:
+                print(f"Applying {migration.path.name}")
+                if migration.transactional:
+                    async with conn.transaction():
+                        await _apply(conn, migration)
+                else:
+                    await _apply(conn, migration)
+            return len(pending)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", LOCK_NAME)
+    finally:
+        await conn.close()
+
+
+async def main():
+    count = await migrate()
+    print(f"Schema up to date ({count} migration{'s' if count != 1 else ''} applied)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Move inline attachment data out of existing messages.content rows into R2.
+
+Run once after deploying R2 references: python -m ark.database.migrate_attachments
+"""
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+from ark.database.utils import acquire, close_pool
+from ark.services.attachments import externalize_content
+
+BATCH_SIZE = 50
+
+# User messages with a base64 data URL in any file or image part
+INLINE_ATTACHMENT_FILTER = (
+    '$[*] ? (@.file.file_data starts with "data:" || @.image_url.url starts with "data:")'
+)
+
+
+async def migrate_inline_attachments(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Rewrite messages with inline attachments to reference R2, in batches
+
+    Rows are walked in id order, so an interrupted run can simply be started
+    again; rows already migrated no longer match. Each batch is written in
+    one transaction with a savepoint per message, so a message whose rows
+    fail to write is skipped without losing the rest of the batch.
+
+    Args:
+        batch_size: Messages rewritten per transaction
+
+    Returns:
+        Number of messages rewritten
+    """
+    last_id = 0
+    migrated = 0
+    while True:
+        async with acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT m.id, m.chat_id, m.message_order, m.content, m.created_at, c.user_id
+                FROM messages m
+                JOIN chats c ON c.id = m.chat_id
+                WHERE m.id > $1 AND m.role = 'user'
+                  AND jsonb_path_exists(m.content, $2::jsonpath)
+                ORDER BY m.id
+                LIMIT $3
+                """,
+                last_id, INLINE_ATTACHMENT_FILTER, batch_size
+            )
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        rewritten: List[Tuple[Any, Any, List[Dict[str, Any]]]] = []
+        for row in rows:
+            try:
+                content, uploaded = await externalize_content(row["content"], row["user_id"], [])
+            except Exception as e:
+                print(f"Skipping message {row['id']}: {e}")
+                continue
+            rewritten.append((row, content, uploaded))
+
+        async with acquire() as conn:
+            async with conn.transaction():
+                for row, content, uploaded in rewritten:
+                    try:
+                        async with conn.transaction():
+                            await _write_message(conn, row, content, uploaded)
+                    except Exception as e:
+                        print(f"Skipping message {row['id']}: {e}")
+                        continue
+                    migrated += 1
+
+        print(f"Migrated {migrated} messages (up to id {last_id})")
+
+    return migrated
+
+
+async def _write_message(conn, row, content: List[Dict[str, Any]], uploaded: List[Dict[str, Any]]):
+    """Rewrite one message and record its uploads, raising on any failure"""
+    await conn.execute("UPDATE messages SET content = $2 WHERE id = $1", row["id"], content)
+    # Files rows are linked to and dated like the message they came from
+    await conn.executemany(
+        """
+        INSERT INTO files (file_key, original_filename, content_type, file_size,
+                           user_id, chat_id, content_hash, created_at, message_order)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT (chat_id, content_hash) DO UPDATE SET file_key = EXCLUDED.file_key
+        """,
+        [
+            (
+                meta["file_key"],
+                meta["original_filename"],
+                meta["content_type"],
+                meta.get("file_size", meta.get("size", 0)),
+                row["user_id"],
+                row["chat_id"],
+                meta.get("content_hash"),
+                row["created_at"],
+                row["message_order"],
+            )
+            for meta in uploaded
+        ],
+    )
+
+
+async def main():
+    try:
+        total = await migrate_inline_attachments()
+        print(f"Done: moved attachments out of {total} messages")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
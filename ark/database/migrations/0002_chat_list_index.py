@@ -0,0 +1,14 @@
+"""
+Keyset pagination of a user's chat list, newest first.
+
+Built concurrently so existing deployments keep accepting writes to chats.
+"""
+from ark.database.migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+
+async def upgrade(conn):
+    await create_index_concurrently(
+        conn, "idx_chats_on_user_updated", "chats (user_id, updated_at DESC, id DESC)"
+    )
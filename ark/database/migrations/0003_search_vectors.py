@@ -0,0 +1,70 @@
+"""
+Full-text search vectors on chat titles and message text.
+
+A STORED generated column would rewrite messages under an ACCESS EXCLUSIVE
+lock for the whole deploy. Instead the column is added empty (a catalog-only
+change), triggers keep new and edited rows up to date, existing rows are
+backfilled in short batches and the GIN indexes are built concurrently.
+"""
+from ark.database.migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+BATCH_SIZE = 1000
+
+VECTOR = "to_tsvector('english', COALESCE({}, ''))"
+
+# (table, text column, id to start the backfill after)
+SEARCHABLE = [
+    ("chats", "title", "00000000-0000-0000-0000-000000000000"),
+    ("messages", "display_text", 0),
+]
+
+
+async def upgrade(conn):
+    for table, column, start in SEARCHABLE:
+        await conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        # Several statements in one call run as one implicit transaction
+        await conn.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {VECTOR.format("NEW." + column)};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS {table}_search_vector ON {table};
+            CREATE TRIGGER {table}_search_vector
+                BEFORE INSERT OR UPDATE OF {column} ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update();
+            """
+        )
+        await _backfill(conn, table, VECTOR.format(column), start)
+        await create_index_concurrently(
+            conn, f"idx_{table}_search", f"{table} USING GIN (search_vector)"
+        )
+
+
+async def _backfill(conn, table: str, vector: str, last_id):
+    """Fill search_vector on existing rows, one committed batch at a time"""
+    scanned = 0
+    while True:
+        row = await conn.fetchrow(
+            f"""
+            WITH batch AS (
+                SELECT id FROM {table} WHERE id > $1 ORDER BY id LIMIT $2
+            ), updated AS (
+                UPDATE {table} t SET search_vector = {vector}
+                FROM batch WHERE t.id = batch.id AND t.search_vector IS NULL
+            )
+            SELECT (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id,
+                   (SELECT count(*) FROM batch) AS count
+            """,
+            last_id, BATCH_SIZE
+        )
+        if not row["count"]:
+            break
+        last_id = row["last_id"]
+        scanned += row["count"]
+    print(f"Backfilled search vectors on {table} ({scanned} rows)")
@@ -0,0 +1,6 @@
+-- Content-addressed uploads: the same object may back several files rows
+
+ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash CHAR(64); -- SHA-256 of the file content
+ALTER TABLE files DROP CONSTRAINT IF EXISTS files_file_key_key;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_files_on_chat_content ON files (chat_id, content_hash);
@@ -0,0 +1,10 @@
+-- Exact-match response cache (see ark.handlers.response_cache)
+
+CREATE TABLE IF NOT EXISTS response_cache (
+    key CHAR(64) PRIMARY KEY, -- SHA-256 of the normalized request
+    message JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_response_cache_on_expires_at ON response_cache (expires_at);
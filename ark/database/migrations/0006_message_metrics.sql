@@ -0,0 +1,8 @@
+-- Per-message generation metrics
+
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS provider VARCHAR(50), -- Provider and model that generated the message
+    ADD COLUMN IF NOT EXISTS model VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS time_to_first_token REAL, -- Seconds
+    ADD COLUMN IF NOT EXISTS prompt_tokens INT,
+    ADD COLUMN IF NOT EXISTS request_bytes INT; -- Size of the request messages
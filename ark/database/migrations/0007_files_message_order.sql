@@ -0,0 +1,14 @@
+-- Link each file to the message it was sent with
+
+ALTER TABLE files ADD COLUMN IF NOT EXISTS message_order INT;
+
+-- Existing rows: the latest user message saved at or before the file. Files
+-- saved in one batch with several user turns all land on the last of them;
+-- rows written from now on record the exact order.
+UPDATE files fr
+SET message_order = (
+    SELECT max(m.message_order)
+    FROM messages m
+    WHERE m.chat_id = fr.chat_id AND m.role = 'user' AND m.created_at <= fr.created_at
+)
+WHERE fr.message_order IS NULL AND fr.chat_id IS NOT NULL;
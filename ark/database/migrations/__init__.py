@@ -0,0 +1,3 @@
+"""
+Numbered schema migrations, applied in order by ark.database.migrate.
+"""
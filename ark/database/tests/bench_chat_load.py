@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark opening a chat: the old four-query path vs load_chat_bundle
+"""
+import time
+import uuid
+import asyncio
+import statistics
+from utils import (
+    acquire,
+    chat_exists,
+    close_pool,
+    create_chat,
+    delete_chat,
+    get_chat,
+    get_chat_messages,
+    init_user_if_not_exists,
+    load_chat_bundle,
+    save_messages_batch,
+)
+from file_utils import get_chat_files, store_file_metadata
+
+MESSAGE_COUNT = 40
+FILE_COUNT = 4
+ITERATIONS = 20
+
+
+async def load_separately(chat_id: str, user_id: str):
+    """The previous chat-open path: four queries, one after another"""
+    if not await chat_exists(chat_id, user_id):
+        return None
+    chat = await get_chat(chat_id)
+    async with acquire() as conn:
+        files = await get_chat_files(conn, chat_id)
+    messages = await get_chat_messages(chat_id)
+    return chat, messages, files
+
+
+async def timed(label: str, load, chat_id: str, user_id: str):
+    samples = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        await load(chat_id, user_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<18} median {statistics.median(samples):7.1f} ms   "
+        f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:7.1f} ms"
+    )
+    return statistics.median(samples)
+
+
+async def bench_chat_load():
+    """Time both load paths against the same chat"""
+    print("⏱️  Benchmarking chat load...")
+
+    test_user_id = "test_user_bench_123"
+    test_chat_id = str(uuid.uuid4())
+
+    try:
+        # Setup: a chat with a realistic number of turns and attachments
+        await init_user_if_not_exists(test_user_id, "Bench User")
+        await create_chat(chat_id=test_chat_id, user_id=test_user_id, title="Benchmark Chat")
+        messages = []
+        for i in range(MESSAGE_COUNT // 2):
+            messages.append({"role": "user", "content": f"Question {i}", "display_text": f"Question {i}"})
+            messages.append({
+                "role": "assistant",
+                "content": f"Answer {i} " * 100,
+                "display_text": f"Answer {i} " * 100,
+                "citations": ["https://example.com"],
+                "generation_time": "1.2s",
+                "total_tokens": 200,
+                "tokens_per_second": 160.0,
+            })
+        await save_messages_batch(test_chat_id, 0, messages)
+        async with acquire() as conn:
+            for i in range(FILE_COUNT):
+                await store_file_metadata(conn, {
+                    "file_key": f"uploads/{test_user_id}/bench-{i}.png",
+                    "content_hash": f"{i:064x}",
+                    "original_filename": f"bench-{i}.png",
+                    "content_type": "image/png",
+                    "file_size": 1024,
+                    "user_id": test_user_id,
+                }, test_chat_id, 2 * i)  # user turns are the even orders
+        print(f"✅ Created chat with {MESSAGE_COUNT} messages and {FILE_COUNT} files")
+
+        # Warm up the pool and statement caches
+        await load_separately(test_chat_id, test_user_id)
+        await load_chat_bundle(test_chat_id, test_user_id)
+
+        separate = await timed("4 queries", load_separately, test_chat_id, test_user_id)
+        bundled = await timed("load_chat_bundle", load_chat_bundle, test_chat_id, test_user_id)
+        print(f"✅ load_chat_bundle is {separate / bundled:.1f}x faster")
+
+        bundle = await load_chat_bundle(test_chat_id, test_user_id)
+        print(f"✅ Bundle: {len(bundle['messages'])} messages, {len(bundle['files'])} files")
+        print(f"✅ Other users get nothing: {await load_chat_bundle(test_chat_id, 'someone_else') is None}")
+
+    except Exception as e:
+        print(f"❌ Benchmark failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        await delete_chat(test_chat_id, test_user_id)
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench_chat_load())
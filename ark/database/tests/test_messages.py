@@ -14,6 +14,7 @@ from utils import (
     save_message_from_dict,
     get_chat_messages,
     save_all_messages,
+    save_messages_batch,
     get_message_count,
     delete_message
 )
@@ -119,6 +120,53 @@ async def test_message_functions():
         batch_success = await save_all_messages(test_chat_id, batch_messages)
         print(f"✅ Batch messages saved: {batch_success}")
         
+        # 5b. Test single round-trip batch save with title update
+        print("\n5b. Testing save_messages_batch...")
+        high_water = await save_messages_batch(
+            test_chat_id,
+            5,
+            [
+                {"role": "user", "content": "Batched question", "display_text": "Batched question"},
+                {"role": "assistant", "content": "Batched answer", "display_text": "Batched answer"},
+            ],
+            title="Batched Title",
+        )
+        print(f"✅ High-water mark after batch: {high_water}")
+        
+        # Re-saving the same orders is a no-op instead of a duplicate key error
+        replay = await save_messages_batch(
+            test_chat_id,
+            5,
+            [{"role": "user", "content": "Batched question", "display_text": "Batched question"}],
+        )
+        print(f"✅ Re-save skipped existing rows: {replay}")
+        
+        # 5c. Batch with list-valued content and citations side by side
+        print("\n5c. Testing save_messages_batch with multimodal content and citations...")
+        mixed_batch = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "What is in this image?"},
+                    {"type": "image_url", "image_url": {"url": "https://example.com/cat.png"}},
+                ],
+                "display_text": "What is in this image?",
+            },
+            {
+                "role": "assistant",
+                "content": "A cat.",
+                "display_text": "A cat.",
+                "citations": ["https://example.com/a", "https://example.com/b", "https://example.com/c"],
+            },
+            {"role": "user", "content": "Thanks", "display_text": "Thanks"},
+        ]
+        mixed_high_water = await save_messages_batch(test_chat_id, 7, mixed_batch)
+        saved = {m["message_order"]: m for m in await get_chat_messages(test_chat_id)}
+        print(f"✅ High-water mark after mixed batch: {mixed_high_water}")
+        print(f"✅ Multimodal content kept as one row: {len(saved[7]['content']) == 2}")
+        print(f"✅ Citations kept: {saved[8]['citations'] == mixed_batch[1]['citations']}")
+        print(f"✅ Plain text row intact: {saved[9]['display_text'] == 'Thanks'}")
+        
         # 6. Test final message retrieval
         print("\n6. Testing final message retrieval...")
         final_messages = await get_chat_messages(test_chat_id)
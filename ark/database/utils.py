@@ -1,11 +1,14 @@
 import asyncpg
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
-from typing import Optional, List, Dict, Any, Union
-import json
+from typing import Optional, List, Dict, Any, Union, AsyncIterator, Tuple
 from datetime import datetime, timezone
 import base64
 import reflex as rx
+from ark.config import DatabaseConfig
+from ark.utils import fast_json
 
 
 load_dotenv()
@@ -51,9 +54,94 @@ def format_time_ago(timestamp):
         return f"{months} month{'s' if months != 1 else ''} ago"
 
 
-async def get_connection():
-    """Get database connection"""
-    return await asyncpg.connect(DB_URL)
+# CONNECTION POOL
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# jsonb's binary wire format is a version byte followed by the JSON text
+_JSONB_VERSION = b"\x01"
+
+
+def _encode_jsonb(value) -> bytes:
+    return _JSONB_VERSION + fast_json.dumps(value)
+
+
+def _decode_jsonb(data: bytes):
+    return fast_json.loads(memoryview(data)[1:])
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """
+    Register json/jsonb codecs on a new pooled connection
+    
+    Values are encoded and decoded once in the driver (with orjson when
+    available), so queries take and return plain Python objects.
+    """
+    await conn.set_type_codec(
+        "json", schema="pg_catalog", format="binary",
+        encoder=fast_json.dumps, decoder=fast_json.loads,
+    )
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog", format="binary",
+        encoder=_encode_jsonb, decoder=_decode_jsonb,
+    )
+
+
+async def init_pool() -> asyncpg.Pool:
+    """
+    Create the process-wide connection pool if it doesn't exist yet
+    
+    Returns:
+        asyncpg.Pool: The shared pool
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                DB_URL,
+                min_size=DatabaseConfig.POOL_MIN_SIZE,
+                max_size=DatabaseConfig.POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=DatabaseConfig.POOL_MAX_INACTIVE_LIFETIME,
+                # Prepared statements are cached per pooled connection, so the
+                # hot queries below are parsed once per connection, not per call
+                statement_cache_size=DatabaseConfig.STATEMENT_CACHE_SIZE,
+                init=_init_connection,
+            )
+    return _pool
+
+
+async def close_pool():
+    """Close the shared connection pool, waiting for checked-out connections"""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            pool, _pool = _pool, None
+            await pool.close()
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Borrow a connection from the shared pool
+    
+    The pool is created lazily on first use, so scripts that never run the
+    Reflex lifespan still work. The connection is returned to the pool when
+    the block exits, including on errors.
+    """
+    pool = _pool or await init_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
+@asynccontextmanager
+async def pool_lifespan():
+    """Reflex lifespan task: open the pool on startup and drain it on shutdown"""
+    await init_pool()
+    try:
+        yield
+    finally:
+        await close_pool()
 
 
 # CHAT FUNCTIONS
@@ -79,15 +167,14 @@ async def create_chat(
         bool: True if successful, False otherwise
     """
     try:
-        conn = await get_connection()
-        await conn.execute(
-            """
-            INSERT INTO chats (id, user_id, title, initial_provider, initial_model, created_at, updated_at)
-            VALUES ($1, $2, $3, $4, $5, NOW(), NOW())
-            """,
-            chat_id, user_id, title, initial_provider, initial_model
-        )
-        await conn.close()
+        async with acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO chats (id, user_id, title, initial_provider, initial_model, created_at, updated_at)
+                VALUES ($1, $2, $3, $4, $5, NOW(), NOW())
+                """,
+                chat_id, user_id, title, initial_provider, initial_model
+            )
         return True
     except Exception as e:
         print(f"Error creating chat: {e}")
@@ -105,16 +192,15 @@ async def get_chat(chat_id: str) -> Optional[Dict[str, Any]]:
         Dict with chat data or None if not found
     """
     try:
-        conn = await get_connection()
-        row = await conn.fetchrow(
-            """
-            SELECT id, user_id, title, initial_provider, initial_model, created_at, updated_at
-            FROM chats 
-            WHERE id = $1
-            """,
-            chat_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT id, user_id, title, initial_provider, initial_model, created_at, updated_at
+                FROM chats 
+                WHERE id = $1
+                """,
+                chat_id
+            )
         
         if row:
             return dict(row)
@@ -137,18 +223,17 @@ async def get_user_chats(user_id: str, limit: int = 50, offset: int = 0) -> List
         List of chat dictionaries
     """
     try:
-        conn = await get_connection()
-        rows = await conn.fetch(
-            """
-            SELECT id, user_id, title, initial_provider, initial_model, created_at, updated_at
-            FROM chats 
-            WHERE user_id = $1
-            ORDER BY updated_at DESC
-            LIMIT $2 OFFSET $3
-            """,
-            user_id, limit, offset
-        )
-        await conn.close()
+        async with acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, user_id, title, initial_provider, initial_model, created_at, updated_at
+                FROM chats 
+                WHERE user_id = $1
+                ORDER BY updated_at DESC
+                LIMIT $2 OFFSET $3
+                """,
+                user_id, limit, offset
+            )
         
         chats = []
         for row in rows:
@@ -162,6 +247,171 @@ async def get_user_chats(user_id: str, limit: int = 50, offset: int = 0) -> List
         return []
 
 
+def _encode_chat_cursor(updated_at: datetime, chat_id) -> str:
+    """Encode the (updated_at, id) keyset position of a chat as an opaque cursor"""
+    return f"{updated_at.isoformat()}|{chat_id}"
+
+
+def _decode_chat_cursor(cursor: str):
+    """Decode a cursor produced by _encode_chat_cursor into (updated_at, id)"""
+    updated_at, chat_id = cursor.split("|", 1)
+    return datetime.fromisoformat(updated_at), chat_id
+
+
+async def get_user_chats_page(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = DatabaseConfig.DEFAULT_CHAT_LIMIT
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Get one page of a user's chats, most recent first, using keyset pagination
+    
+    Pages are positioned by (updated_at, id) rather than OFFSET, so each page
+    is a single range scan of idx_chats_on_user_updated no matter how deep
+    the user has scrolled.
+    
+    Args:
+        user_id: User ID from Clerk authentication
+        cursor: Cursor returned with the previous page, or None for the first page
+        limit: Maximum number of chats to return
+        
+    Returns:
+        Tuple of (list of chat dictionaries, cursor for the next page or None)
+    """
+    try:
+        async with acquire() as conn:
+            # Fetch one extra row to learn whether another page exists
+            if cursor:
+                cursor_updated_at, cursor_id = _decode_chat_cursor(cursor)
+                rows = await conn.fetch(
+                    """
+                    SELECT id, user_id, title, initial_provider, initial_model, created_at, updated_at
+                    FROM chats
+                    WHERE user_id = $1 AND (updated_at, id) < ($2, $3::UUID)
+                    ORDER BY updated_at DESC, id DESC
+                    LIMIT $4
+                    """,
+                    user_id, cursor_updated_at, cursor_id, limit + 1
+                )
+            else:
+                rows = await conn.fetch(
+                    """
+                    SELECT id, user_id, title, initial_provider, initial_model, created_at, updated_at
+                    FROM chats
+                    WHERE user_id = $1
+                    ORDER BY updated_at DESC, id DESC
+                    LIMIT $2
+                    """,
+                    user_id, limit + 1
+                )
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = (
+            _encode_chat_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+            if has_more else None
+        )
+        
+        chats = []
+        for row in rows:
+            chat = dict(row)
+            chat['updated_at'] = format_time_ago(chat['updated_at'])
+            chats.append(chat)
+        
+        return chats, next_cursor
+    except Exception as e:
+        print(f"Error fetching user chats page: {e}")
+        return [], None
+
+
+async def search_user_chats(
+    user_id: str,
+    query: str,
+    cursor: Optional[str] = None,
+    limit: int = DatabaseConfig.SEARCH_PAGE_SIZE
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Full-text search over a user's chat titles and message text
+    
+    Matches use the GIN-indexed search_vector columns on chats and messages.
+    Each chat appears once, ranked by its best match (title hits weigh
+    double), with an HTML-escaped snippet whose matches are wrapped in <mark>.
+    
+    Args:
+        user_id: User ID from Clerk authentication
+        query: Free-form search text (websearch syntax: quotes, OR, -word)
+        cursor: Cursor returned with the previous page, or None for the first page
+        limit: Maximum number of chats to return
+        
+    Returns:
+        Tuple of (list of chat dictionaries with a snippet, cursor for the next page or None)
+    """
+    if not query.strip():
+        return [], None
+
+    cursor_rank, cursor_id = None, None
+    if cursor:
+        rank, cursor_id = cursor.split("|", 1)
+        cursor_rank = float(rank)
+
+    try:
+        async with acquire() as conn:
+            rows = await conn.fetch(
+                """
+                WITH q AS (
+                    SELECT websearch_to_tsquery('english', $2) AS query
+                ),
+                matches AS (
+                    SELECT c.id AS chat_id, ts_rank(c.search_vector, q.query) * 2 AS rank, NULL::INT AS message_id
+                    FROM chats c, q
+                    WHERE c.user_id = $1 AND c.search_vector @@ q.query
+                    UNION ALL
+                    SELECT m.chat_id, ts_rank(m.search_vector, q.query), m.id
+                    FROM messages m
+                    JOIN chats c ON c.id = m.chat_id, q
+                    WHERE c.user_id = $1 AND m.search_vector @@ q.query
+                ),
+                best AS (
+                    SELECT DISTINCT ON (chat_id) chat_id, rank, message_id
+                    FROM matches
+                    ORDER BY chat_id, rank DESC
+                )
+                SELECT c.id, c.title, c.updated_at, b.rank,
+                       ts_headline(
+                           'english',
+                           replace(replace(replace(
+                               COALESCE(m.display_text, c.title), '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                           q.query,
+                           'StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=10, MaxFragments=2'
+                       ) AS snippet
+                FROM best b
+                JOIN chats c ON c.id = b.chat_id
+                LEFT JOIN messages m ON m.id = b.message_id
+                CROSS JOIN q
+                WHERE $3::REAL IS NULL OR (b.rank, b.chat_id) < ($3::REAL, $4::UUID)
+                ORDER BY b.rank DESC, b.chat_id DESC
+                LIMIT $5
+                """,
+                user_id, query, cursor_rank, cursor_id, limit + 1
+            )
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['rank']!r}|{rows[-1]['id']}" if has_more else None
+        
+        results = []
+        for row in rows:
+            result = dict(row)
+            result.pop('rank')
+            result['updated_at'] = format_time_ago(result['updated_at'])
+            results.append(result)
+        
+        return results, next_cursor
+    except Exception as e:
+        print(f"Error searching user chats: {e}")
+        return [], None
+
+
 async def update_chat_title(chat_id: str, title: str) -> bool:
     """
     Update the title of a chat
@@ -174,16 +424,15 @@ async def update_chat_title(chat_id: str, title: str) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        conn = await get_connection()
-        result = await conn.execute(
-            """
-            UPDATE chats 
-            SET title = $1, updated_at = NOW()
-            WHERE id = $2
-            """,
-            title, chat_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE chats 
+                SET title = $1, updated_at = NOW()
+                WHERE id = $2
+                """,
+                title, chat_id
+            )
         
         # Check if any row was updated
         return result.split()[-1] == "1"
@@ -203,16 +452,15 @@ async def update_chat_timestamp(chat_id: str) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        conn = await get_connection()
-        result = await conn.execute(
-            """
-            UPDATE chats 
-            SET updated_at = NOW()
-            WHERE id = $1
-            """,
-            chat_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE chats 
+                SET updated_at = NOW()
+                WHERE id = $1
+                """,
+                chat_id
+            )
         
         return result.split()[-1] == "1"
     except Exception as e:
@@ -231,49 +479,44 @@ async def delete_chat(chat_id: str, user_id: str) -> bool:
     Returns:
         bool: True if successful, False otherwise
     """
-    conn = None
     try:
-        conn = await get_connection()
-        
-        # First check if the chat exists and belongs to the user
-        chat_check = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM chats 
-            WHERE id = $1::UUID AND user_id = $2
-            """,
-            chat_id, user_id
-        )
-        
-        if chat_check == 0:
-            print(f"Chat {chat_id} not found or does not belong to user {user_id}")
-            return False
-        
-        # Delete the chat - CASCADE will handle messages automatically
-        result = await conn.execute(
-            """
-            DELETE FROM chats 
-            WHERE id = $1::UUID AND user_id = $2
-            """,
-            chat_id, user_id
-        )
-        
-        # Parse the result string (e.g., "DELETE 1" -> 1 row affected)
-        rows_affected = int(result.split()[-1]) if result else 0
-        success = rows_affected > 0
-        
-        if success:
-            print(f"Successfully deleted chat {chat_id}")
-        else:
-            print(f"Failed to delete chat {chat_id} - no rows affected")
-            
-        return success
-        
+        async with acquire() as conn:
+            # First check if the chat exists and belongs to the user
+            chat_check = await conn.fetchval(
+                """
+                SELECT COUNT(*) FROM chats 
+                WHERE id = $1::UUID AND user_id = $2
+                """,
+                chat_id, user_id
+            )
+
+            if chat_check == 0:
+                print(f"Chat {chat_id} not found or does not belong to user {user_id}")
+                return False
+
+            # Delete the chat - CASCADE will handle messages automatically
+            result = await conn.execute(
+                """
+                DELETE FROM chats 
+                WHERE id = $1::UUID AND user_id = $2
+                """,
+                chat_id, user_id
+            )
+
+            # Parse the result string (e.g., "DELETE 1" -> 1 row affected)
+            rows_affected = int(result.split()[-1]) if result else 0
+            success = rows_affected > 0
+
+            if success:
+                print(f"Successfully deleted chat {chat_id}")
+            else:
+                print(f"Failed to delete chat {chat_id} - no rows affected")
+
+            return success
+
     except Exception as e:
         print(f"Error deleting chat {chat_id}: {e}")
         return False
-    finally:
-        if conn:
-            await conn.close()
 
 
 async def chat_exists(chat_id: str, user_id: str) -> bool:
@@ -288,15 +531,14 @@ async def chat_exists(chat_id: str, user_id: str) -> bool:
         bool: True if chat exists and belongs to user, False otherwise
     """
     try:
-        conn = await get_connection()
-        row = await conn.fetchrow(
-            """
-            SELECT 1 FROM chats 
-            WHERE id = $1 AND user_id = $2
-            """,
-            chat_id, user_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT 1 FROM chats 
+                WHERE id = $1 AND user_id = $2
+                """,
+                chat_id, user_id
+            )
         
         return row is not None
     except Exception as e:
@@ -318,36 +560,16 @@ async def init_user_if_not_exists(user_id: str, first_name: str = "") -> bool:
         bool: True if user exists or was created successfully
     """
     try:
-        conn = await get_connection()
-        
-        # Check if user exists
-        exists = await conn.fetchrow(
-            "SELECT 1 FROM users WHERE id = $1",
-            user_id
-        )
-        
-        if not exists:
-            # Create users table if it doesn't exist
-            await conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users (
-                    id VARCHAR(255) PRIMARY KEY,
-                    first_name VARCHAR(255),
-                    created_at TIMESTAMPTZ DEFAULT NOW()
-                )
-                """
-            )
-            
-            # Insert new user
+        async with acquire() as conn:
+            # A single statement, so concurrent first sign-ins of one user cannot race
             await conn.execute(
                 """
                 INSERT INTO users (id, first_name, created_at)
                 VALUES ($1, $2, NOW())
+                ON CONFLICT (id) DO NOTHING
                 """,
                 user_id, first_name
             )
-        
-        await conn.close()
         return True
     except Exception as e:
         print(f"Error initializing user: {e}")
@@ -387,33 +609,28 @@ async def save_message(
         bool: True if successful, False otherwise
     """
     try:
-        conn = await get_connection()
-        
-        # Convert content to JSON if it's a list
-        content_json = json.dumps(content) if isinstance(content, list) else json.dumps([{"type": "text", "text": content}])
-        citations_json = json.dumps(citations) if citations else None
-        
-        await conn.execute(
-            """
-            INSERT INTO messages (
-                chat_id, message_order, role, content, display_text,
-                thinking, citations, generation_time, total_tokens, tokens_per_second, created_at
+        content_parts = _encode_content(content)
+
+        async with acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO messages (
+                    chat_id, message_order, role, content, display_text,
+                    thinking, citations, generation_time, total_tokens, tokens_per_second, created_at
+                )
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, NOW())
+                """,
+                chat_id, message_order, role, content_parts, display_text,
+                thinking or None, citations or None, generation_time or None, 
+                total_tokens if total_tokens > 0 else None, 
+                tokens_per_second if tokens_per_second > 0 else None
+            )
+
+            # Update chat timestamp
+            await conn.execute(
+                "UPDATE chats SET updated_at = NOW() WHERE id = $1",
+                chat_id
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, NOW())
-            """,
-            chat_id, message_order, role, content_json, display_text,
-            thinking or None, citations_json, generation_time or None, 
-            total_tokens if total_tokens > 0 else None, 
-            tokens_per_second if tokens_per_second > 0 else None
-        )
-        
-        # Update chat timestamp
-        await conn.execute(
-            "UPDATE chats SET updated_at = NOW() WHERE id = $1",
-            chat_id
-        )
-        
-        await conn.close()
         return True
     except Exception as e:
         print(f"Error saving message: {e}")
@@ -445,31 +662,109 @@ async def save_message_from_dict(chat_id: str, message_order: int, message_dict:
         tokens_per_second=message_dict.get("tokens_per_second", 0.0)
     )
     
-    # If message has files and this is a user message, handle R2 metadata saving
-    if success and message_dict.get("files") and message_dict.get("role") == "user":
-        try:
-            user_id = message_dict.get("user_id")
-            if user_id:
-                # Separate R2 files (already uploaded) from legacy files (need upload)
-                r2_files = [f for f in message_dict.get("files", []) if f.get("file_key")]
-                legacy_files = [f for f in message_dict.get("files", []) if not f.get("file_key") and f.get("filename")]
-                
-                # Save metadata for R2 files that are already uploaded
-                if r2_files:
-                    await _save_r2_file_metadata(chat_id, r2_files, user_id)
-                
-                # Upload legacy files to R2 (fallback case)
-                if legacy_files:
-                    await _upload_files_to_r2_and_save(chat_id, legacy_files, user_id)
-                    
-        except Exception as e:
-            print(f"Error handling file metadata: {e}")
-            # Don't fail the entire operation for file upload errors
+    if success:
+        await _save_message_files(chat_id, message_dict, message_order)
     
     return success
 
 
-async def _save_r2_file_metadata(chat_id: str, r2_files: List[Dict[str, Any]], user_id: str):
+def _encode_content(content: Union[str, List[Dict]]) -> List[Dict]:
+    """Normalize message content to the JSONB shape stored in messages.content"""
+    # Plain strings are stored as a single text part
+    if isinstance(content, list):
+        return content
+    return [{"type": "text", "text": content}]
+
+
+def _json_text(value) -> Optional[str]:
+    """
+    JSON text of one value bound into a text[] and cast to jsonb per row
+
+    A jsonb[] parameter won't do: asyncpg reads a list element as another
+    array dimension rather than as a single jsonb value.
+    """
+    if value is None:
+        return None
+    return fast_json.dumps(value).decode("utf-8")
+
+
+async def _externalize_attachments(message_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Swap inline attachments in a user message for R2 references before it is stored
+    
+    Bytes that aren't in R2 yet are uploaded, and the message's files list is
+    updated to the stored objects so _save_message_files records them.
+    
+    Args:
+        message_dict: ChatMessage dictionary, with user_id set for file uploads
+        
+    Returns:
+        The message to store (the input itself if there was nothing to move)
+    """
+    from ark.services.attachments import externalize_content, has_attachments
+
+    user_id = message_dict.get("user_id")
+    content = message_dict.get("content")
+    if message_dict.get("role") != "user" or not user_id or not has_attachments(content):
+        return message_dict
+
+    try:
+        files = message_dict.get("files") or []
+        new_content, uploaded = await externalize_content(content, user_id, files)
+    except Exception as e:
+        print(f"Error moving attachments to R2, storing them inline: {e}")
+        return message_dict
+
+    # Local uploads now live in R2 through the message content
+    stored_files = [f for f in files if f.get("file_key")] + [
+        {
+            "file_key": meta["file_key"],
+            "original_filename": meta["original_filename"],
+            "content_type": meta["content_type"],
+            "file_size": meta["size"],
+            "content_hash": meta["content_hash"],
+        }
+        for meta in uploaded
+    ]
+    return {**message_dict, "content": new_content, "files": stored_files}
+
+
+async def _save_message_files(chat_id: str, message_dict: Dict[str, Any], message_order: int):
+    """
+    Persist file metadata for a saved user message (R2 references and legacy uploads)
+    
+    Args:
+        chat_id: UUID string for the chat
+        message_dict: ChatMessage dictionary, with user_id set for file uploads
+        message_order: Order of the saved message, recorded on its files rows
+    """
+    # If message has files and this is a user message, handle R2 metadata saving
+    if not message_dict.get("files") or message_dict.get("role") != "user":
+        return
+
+    try:
+        user_id = message_dict.get("user_id")
+        if user_id:
+            # Separate R2 files (already uploaded) from legacy files (need upload)
+            r2_files = [f for f in message_dict.get("files", []) if f.get("file_key")]
+            legacy_files = [f for f in message_dict.get("files", []) if not f.get("file_key") and f.get("filename")]
+            
+            # Save metadata for R2 files that are already uploaded
+            if r2_files:
+                await _save_r2_file_metadata(chat_id, r2_files, user_id, message_order)
+            
+            # Upload legacy files to R2 (fallback case)
+            if legacy_files:
+                await _upload_files_to_r2_and_save(chat_id, legacy_files, user_id, message_order)
+                
+    except Exception as e:
+        print(f"Error handling file metadata: {e}")
+        # Don't fail the entire operation for file upload errors
+
+
+async def _save_r2_file_metadata(
+    chat_id: str, r2_files: List[Dict[str, Any]], user_id: str, message_order: Optional[int] = None
+):
     """
     Save metadata for R2 files that are already uploaded
     
@@ -477,11 +772,12 @@ async def _save_r2_file_metadata(chat_id: str, r2_files: List[Dict[str, Any]], u
         chat_id: The chat ID to associate files with
         r2_files: List of R2 FileReference dicts with file_key, original_filename, etc.
         user_id: The user ID for file organization
+        message_order: Order of the message the files belong to
     """
     from ark.database.file_utils import store_file_metadata
+    from ark.services.r2_storage import arestore_missing
     
-    conn = await get_connection()
-    try:
+    async with acquire() as conn:
         for file_ref in r2_files:
             if file_ref.get("file_key"):
                 # Convert FileReference to metadata format for database
@@ -490,19 +786,25 @@ async def _save_r2_file_metadata(chat_id: str, r2_files: List[Dict[str, Any]], u
                     'original_filename': file_ref.get('original_filename', 'unknown'),
                     'content_type': file_ref.get('content_type', 'application/octet-stream'),
                     'file_size': file_ref.get('file_size', 0),
+                    'content_hash': file_ref.get('content_hash'),
                     'user_id': user_id
                 }
                 
-                file_id = await store_file_metadata(conn, r2_metadata, chat_id)
+                file_id = await store_file_metadata(conn, r2_metadata, chat_id, message_order)
                 if file_id:
                     print(f"Saved R2 file metadata: {file_ref.get('original_filename')}")
                 else:
                     print(f"Failed to save metadata for R2 file: {file_ref.get('original_filename')}")
-    finally:
-        await conn.close()
 
+    # The rows now hold the objects; bring back any a concurrent chat delete removed
+    missing = await arestore_missing(r2_files)
+    if missing:
+        print(f"Files missing from R2 after saving chat {chat_id}: {missing}")
 
-async def _upload_files_to_r2_and_save(chat_id: str, files_metadata: List[Dict[str, Any]], user_id: str):
+
+async def _upload_files_to_r2_and_save(
+    chat_id: str, files_metadata: List[Dict[str, Any]], user_id: str, message_order: Optional[int] = None
+):
     """
     Upload files from local storage to R2 and save metadata to database
     
@@ -510,12 +812,12 @@ async def _upload_files_to_r2_and_save(chat_id: str, files_metadata: List[Dict[s
         chat_id: The chat ID to associate files with
         files_metadata: List of file metadata dicts with filename, content_type, type
         user_id: The user ID for file organization
+        message_order: Order of the message the files belong to
     """
-    from ark.services.r2_storage import upload_file, generate_presigned_url
+    from ark.services.r2_storage import aupload_file
     from ark.database.file_utils import store_file_metadata
     
-    conn = await get_connection()
-    try:
+    async with acquire() as conn:
         upload_dir = rx.get_upload_dir()
         
         for file_meta in files_metadata:
@@ -538,7 +840,7 @@ async def _upload_files_to_r2_and_save(chat_id: str, files_metadata: List[Dict[s
                     file_content = f.read()
                 
                 # Upload to R2
-                r2_metadata = upload_file(
+                r2_metadata = await aupload_file(
                     file_path=filename,
                     file_content=file_content,
                     content_type=content_type,
@@ -548,7 +850,17 @@ async def _upload_files_to_r2_and_save(chat_id: str, files_metadata: List[Dict[s
                 if r2_metadata:
                     # Store metadata in database
                     r2_metadata['user_id'] = user_id
-                    file_id = await store_file_metadata(conn, r2_metadata, chat_id)
+                    file_id = await store_file_metadata(conn, r2_metadata, chat_id, message_order)
+                    
+                    if file_id and r2_metadata.get("deduplicated"):
+                        # The object may have been deleted between the upload's
+                        # existence check and the insert; upload again if so
+                        await aupload_file(
+                            file_path=filename,
+                            file_content=file_content,
+                            content_type=content_type,
+                            user_id=user_id
+                        )
                     
                     if file_id:
                         print(f"Successfully uploaded {filename} to R2 and saved metadata")
@@ -567,40 +879,47 @@ async def _upload_files_to_r2_and_save(chat_id: str, files_metadata: List[Dict[s
             except Exception as e:
                 print(f"Error processing file {filename}: {e}")
                 
-    finally:
-        await conn.close()
 
 
-async def get_chat_messages(chat_id: str) -> List[Dict[str, Any]]:
+async def get_chat_messages(
+    chat_id: str, before_order: Optional[int] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
     """
-    Get all messages for a specific chat, ordered by message_order
+    Get messages for a specific chat, ordered by message_order
+    
+    With a limit, only the newest `limit` messages before before_order are
+    read, walking the (chat_id, message_order) index backwards, so the cost
+    doesn't grow with the length of the chat.
     
     Args:
         chat_id: UUID string for the chat
+        before_order: Only messages with a lower message_order (default: from the end)
+        limit: Maximum number of messages (default: all)
         
     Returns:
         List of message dictionaries in order
     """
     try:
-        conn = await get_connection()
-        rows = await conn.fetch(
-            """
-            SELECT id, chat_id, message_order, role, content, display_text,
-                   thinking, citations, generation_time, total_tokens, tokens_per_second, created_at
-            FROM messages 
-            WHERE chat_id = $1
-            ORDER BY message_order ASC
-            """,
-            chat_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, chat_id, message_order, role, content, display_text,
+                       thinking, citations, generation_time, total_tokens, tokens_per_second,
+                       provider, model, time_to_first_token, prompt_tokens, request_bytes, created_at
+                FROM messages 
+                WHERE chat_id = $1 AND ($2::int IS NULL OR message_order < $2)
+                ORDER BY message_order DESC
+                LIMIT $3
+                """,
+                chat_id, before_order, limit
+            )
         
         messages = []
-        for row in rows:
+        for row in reversed(rows):
             message = dict(row)
-            # Parse JSON fields back to Python objects
-            message['content'] = json.loads(message['content']) if message['content'] else []
-            message['citations'] = json.loads(message['citations']) if message['citations'] else []
+            # JSONB columns arrive decoded by the connection's codecs
+            message['content'] = message['content'] or []
+            message['citations'] = message['citations'] or []
             messages.append(message)
         
         return messages
@@ -609,6 +928,97 @@ async def get_chat_messages(chat_id: str) -> List[Dict[str, Any]]:
         return []
 
 
+async def load_chat_bundle(
+    chat_id: str,
+    user_id: str,
+    before_order: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Load everything needed to open a chat in a single round trip
+
+    Ownership check, chat metadata, ordered messages and file rows come back
+    from one statement, with messages and files aggregated as JSON. Each
+    file carries the message_order of the message it was sent with (NULL
+    for rows saved before files recorded it).
+
+    Messages can be windowed like get_chat_messages; files are then limited
+    to the ones belonging to the returned messages.
+
+    Args:
+        chat_id: UUID string for the chat
+        user_id: Clerk user ID that must own the chat
+        before_order: Only messages with a lower message_order (default: from the end)
+        limit: Maximum number of messages (default: all)
+
+    Returns:
+        Dict with "chat", "messages", "files", "has_earlier" (older messages
+        exist) and "next_order" (message_order for the next new message), or
+        None if the chat doesn't exist, belongs to someone else, or the query failed
+    """
+    try:
+        async with acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT
+                    json_build_object(
+                        'id', c.id, 'title', c.title,
+                        'initial_provider', c.initial_provider, 'initial_model', c.initial_model
+                    ) AS chat,
+                    COALESCE((
+                        SELECT json_agg(m ORDER BY m.message_order)
+                        FROM (
+                            -- One extra row tells whether older messages exist
+                            SELECT message_order, role, content, display_text, thinking,
+                                   citations, generation_time, total_tokens, tokens_per_second
+                            FROM messages
+                            WHERE chat_id = c.id AND ($3::int IS NULL OR message_order < $3)
+                            ORDER BY message_order DESC
+                            LIMIT $4::int + 1
+                        ) m
+                    ), '[]') AS messages,
+                    COALESCE((
+                        SELECT json_agg(f ORDER BY f.created_at)
+                        FROM (
+                            SELECT fr.id, fr.file_key, fr.content_hash, fr.original_filename,
+                                   fr.content_type, fr.file_size, fr.created_at, fr.message_order
+                            FROM files fr
+                            WHERE fr.chat_id = c.id
+                        ) f
+                    ), '[]') AS files,
+                    (
+                        SELECT COALESCE(max(message_order) + 1, 0)
+                        FROM messages
+                        WHERE chat_id = c.id
+                    ) AS next_order
+                FROM chats c
+                WHERE c.id = $1 AND c.user_id = $2
+                """,
+                chat_id, user_id, before_order, limit
+            )
+    except Exception as e:
+        print(f"Error loading chat bundle: {e}")
+        return None
+
+    if row is None:
+        return None
+
+    bundle = dict(row)
+    messages = bundle["messages"]
+    bundle["has_earlier"] = limit is not None and len(messages) > limit
+    if bundle["has_earlier"]:
+        messages = bundle["messages"] = messages[1:]
+
+    # Keep the files of the loaded messages; unmatched ones belong to the start
+    orders = {message["message_order"] for message in messages}
+    bundle["files"] = [
+        file for file in bundle["files"]
+        if file["message_order"] in orders
+        or (file["message_order"] is None and not bundle["has_earlier"])
+    ]
+    return bundle
+
+
 async def save_all_messages(chat_id: str, messages: List[Dict[str, Any]], start_order: int = 0) -> bool:
     """
     Save all messages from a conversation (batch operation)
@@ -621,17 +1031,136 @@ async def save_all_messages(chat_id: str, messages: List[Dict[str, Any]], start_
     Returns:
         bool: True if all successful, False otherwise
     """
+    return await save_messages_batch(chat_id, start_order, messages) is not None
+
+
+async def _existing_message_orders(chat_id: str, start_order: int, count: int) -> set:
+    """message_orders in [start_order, start_order + count) already stored for a chat"""
     try:
-        success_count = 0
-        for i, message in enumerate(messages):
-            success = await save_message_from_dict(chat_id, start_order + i, message)
-            if success:
-                success_count += 1
+        async with acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT message_order FROM messages
+                WHERE chat_id = $1 AND message_order >= $2 AND message_order < $2 + $3
+                """,
+                chat_id, start_order, count
+            )
+        return {row["message_order"] for row in rows}
+    except Exception as e:
+        print(f"Error checking existing messages: {e}")
+        return set()
+
+
+async def save_messages_batch(
+    chat_id: str,
+    start_order: int,
+    messages: List[Dict[str, Any]],
+    title: Optional[str] = None
+) -> Optional[int]:
+    """
+    Save a run of consecutive messages in a single round trip
+    
+    All rows are inserted by one statement together with the chat's
+    updated_at (and optionally title) bump, so the batch is atomic. Rows that
+    already exist for (chat_id, message_order) are skipped, which makes
+    re-saving an already persisted prefix harmless.
+    
+    Args:
+        chat_id: UUID string for the chat
+        start_order: message_order of the first message in the batch
+        messages: List of ChatMessage dictionaries
+        title: New chat title, or None to keep the current one
         
-        return success_count == len(messages)
+    Returns:
+        int: New high-water mark (next unsaved message_order), None on failure
+    """
+    if not messages:
+        return start_order
+
+    # Keep attachment bytes out of messages.content; rows only reference R2.
+    # Orders already stored are skipped by the insert, so nothing is uploaded
+    # for them when a batch is saved again.
+    from ark.services.attachments import has_attachments
+
+    existing_orders = set()
+    if any(m.get("role") == "user" and has_attachments(m.get("content")) for m in messages):
+        existing_orders = await _existing_message_orders(chat_id, start_order, len(messages))
+
+    async def externalize(order: int, message: Dict[str, Any]) -> Dict[str, Any]:
+        if order in existing_orders:
+            return message
+        return await _externalize_attachments(message)
+
+    messages = await asyncio.gather(
+        *(externalize(start_order + i, m) for i, m in enumerate(messages))
+    )
+
+    orders, roles, contents, display_texts, thinkings = [], [], [], [], []
+    citations, generation_times, total_tokens, tokens_per_second = [], [], [], []
+    providers, models, first_token_times, prompt_tokens, request_bytes = [], [], [], [], []
+    for i, message in enumerate(messages):
+        orders.append(start_order + i)
+        roles.append(message.get("role", ""))
+        contents.append(_json_text(_encode_content(message.get("content", ""))))
+        display_texts.append(message.get("display_text", ""))
+        thinkings.append(message.get("thinking") or None)
+        citations.append(_json_text(message.get("citations") or None))
+        generation_times.append(message.get("generation_time") or None)
+        total_tokens.append(message.get("total_tokens") or None)
+        tokens_per_second.append(message.get("tokens_per_second") or None)
+        providers.append(message.get("provider") or None)
+        models.append(message.get("model") or None)
+        first_token_times.append(message.get("time_to_first_token"))
+        prompt_tokens.append(message.get("prompt_tokens"))
+        request_bytes.append(message.get("request_bytes") or None)
+
+    try:
+        async with acquire() as conn:
+            inserted_orders = await conn.fetchval(
+                """
+                WITH inserted AS (
+                    INSERT INTO messages (
+                        chat_id, message_order, role, content, display_text,
+                        thinking, citations, generation_time, total_tokens, tokens_per_second,
+                        provider, model, time_to_first_token, prompt_tokens, request_bytes, created_at
+                    )
+                    SELECT $1::uuid, m.message_order, m.role, m.content::jsonb, m.display_text,
+                           m.thinking, m.citations::jsonb, m.generation_time, m.total_tokens, m.tokens_per_second,
+                           m.provider, m.model, m.time_to_first_token, m.prompt_tokens, m.request_bytes, NOW()
+                    FROM unnest(
+                        $2::int[], $3::varchar[], $4::text[], $5::text[], $6::text[],
+                        $7::text[], $8::varchar[], $9::int[], $10::real[],
+                        $11::varchar[], $12::varchar[], $13::real[], $14::int[], $15::int[]
+                    ) AS m(
+                        message_order, role, content, display_text, thinking,
+                        citations, generation_time, total_tokens, tokens_per_second,
+                        provider, model, time_to_first_token, prompt_tokens, request_bytes
+                    )
+                    ON CONFLICT (chat_id, message_order) DO NOTHING
+                    RETURNING message_order
+                )
+                UPDATE chats
+                SET updated_at = NOW(), title = COALESCE($16, title)
+                WHERE id = $1
+                RETURNING (SELECT array_agg(message_order) FROM inserted)
+                """,
+                chat_id, orders, roles, contents, display_texts, thinkings,
+                citations, generation_times, total_tokens, tokens_per_second,
+                providers, models, first_token_times, prompt_tokens, request_bytes, title
+            )
     except Exception as e:
-        print(f"Error saving all messages: {e}")
-        return False
+        print(f"Error saving message batch: {e}")
+        return None
+
+    inserted_orders = set(inserted_orders or [])
+    print(f"Saved {len(inserted_orders)} of {len(messages)} messages for chat {chat_id}")
+
+    # Attach file metadata only for rows written now, so re-saves don't duplicate it
+    for i, message in enumerate(messages):
+        if start_order + i in inserted_orders:
+            await _save_message_files(chat_id, message, start_order + i)
+
+    return start_order + len(messages)
 
 
 async def delete_message(chat_id: str, message_order: int) -> bool:
@@ -646,15 +1175,14 @@ async def delete_message(chat_id: str, message_order: int) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        conn = await get_connection()
-        result = await conn.execute(
-            """
-            DELETE FROM messages 
-            WHERE chat_id = $1 AND message_order = $2
-            """,
-            chat_id, message_order
-        )
-        await conn.close()
+        async with acquire() as conn:
+            result = await conn.execute(
+                """
+                DELETE FROM messages 
+                WHERE chat_id = $1 AND message_order = $2
+                """,
+                chat_id, message_order
+            )
         
         return result.split()[-1] == "1"
     except Exception as e:
@@ -673,12 +1201,11 @@ async def get_message_count(chat_id: str) -> int:
         int: Number of messages
     """
     try:
-        conn = await get_connection()
-        count = await conn.fetchval(
-            "SELECT COUNT(*) FROM messages WHERE chat_id = $1",
-            chat_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            count = await conn.fetchval(
+                "SELECT COUNT(*) FROM messages WHERE chat_id = $1",
+                chat_id
+            )
         
         return count or 0
     except Exception as e:
@@ -697,12 +1224,11 @@ async def get_next_message_order(chat_id: str) -> int:
         int: Next message order number
     """
     try:
-        conn = await get_connection()
-        max_order = await conn.fetchval(
-            "SELECT COALESCE(MAX(message_order), -1) + 1 FROM messages WHERE chat_id = $1",
-            chat_id
-        )
-        await conn.close()
+        async with acquire() as conn:
+            max_order = await conn.fetchval(
+                "SELECT COALESCE(MAX(message_order), -1) + 1 FROM messages WHERE chat_id = $1",
+                chat_id
+            )
         
         return max_order or 0
     except Exception as e:
@@ -3,10 +3,21 @@ Message handling logic for AI interactions.
 """
 import time
 import json
-import re
+import asyncio
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from ark.models.chat import ChatMessage
 from ark.providers.manager import provider_manager
+from ark.providers.catalog import model_catalog
+from ark.handlers.think_parser import ThinkTagParser
+from ark.handlers.response_cache import response_cache
+from ark.services.metrics import GenerationMetrics, payload_size
+from ark.config import StreamingConfig
+
+
+# Wire projections kept per message. Each entry pins its message and copy, so
+# the memo is bounded by the size of their strings rather than by count
+WIRE_MEMO_MAX_BYTES = 4 * 1024 * 1024
 
 
 class MessageHandler:
@@ -14,10 +25,50 @@ class MessageHandler:
     
     def __init__(self):
         self.provider_manager = provider_manager
+        # id(message) -> (message, content, wire message, size in bytes)
+        self._wire_memo: "OrderedDict[int, Tuple[dict, Any, Dict[str, Any], int]]" = OrderedDict()
+        self._wire_memo_bytes = 0
+
+    def to_wire_messages(self, messages: List[ChatMessage]) -> List[Dict[str, Any]]:
+        """
+        Project chat messages onto the OpenAI wire format (role + content only).
+
+        UI-only fields such as display_text, files (with their base64 copies),
+        thinking and citations are left out. Each message is converted once
+        and reused on later turns while its content is unchanged.
+        """
+        return [self._to_wire(message) for message in messages]
+
+    def _to_wire(self, message: ChatMessage) -> Dict[str, Any]:
+        # State vars arrive wrapped in Reflex proxies; key on the real dict
+        raw = getattr(message, "__wrapped__", message)
+        content = raw.get("content", "")
+        key = id(raw)
+
+        entry = self._wire_memo.get(key)
+        if entry and entry[0] is raw and entry[1] is content:
+            self._wire_memo.move_to_end(key)
+            return entry[2]
+
+        wire = {"role": raw["role"], "content": _plain(content)}
+        if entry:
+            del self._wire_memo[key]
+            self._wire_memo_bytes -= entry[3]
+
+        # Inline attachments would crowd out everything else; don't keep them
+        size = payload_size(wire["content"])
+        if size > WIRE_MEMO_MAX_BYTES // 8:
+            return wire
+        self._wire_memo[key] = (raw, content, wire, size)
+        self._wire_memo_bytes += size
+        while self._wire_memo_bytes > WIRE_MEMO_MAX_BYTES:
+            _, evicted = self._wire_memo.popitem(last=False)
+            self._wire_memo_bytes -= evicted[3]
+        return wire
     
-    def process_message(
+    async def aprocess_message(
         self,
-        messages: List[Dict[str, str]],
+        messages: List[ChatMessage],
         provider: str = "openrouter",
         model: Optional[str] = None,
         action: str = ""
@@ -30,13 +81,16 @@ class MessageHandler:
         """
         start_time = time.time()
         
-        # Make the API call
-        response = self.provider_manager.chat_completion(
-            messages=messages,
+        response = await self.provider_manager.achat_completion(
+            messages=self.to_wire_messages(messages),
             provider_name=provider,
             model=model
         )
         
+        return self._process_response(response, start_time)
+    
+    def _process_response(self, response, start_time: float) -> ChatMessage:
+        """Turn a non-streaming completion into a ChatMessage with metadata."""
         # Calculate timing metrics
         end_time = time.time()
         generation_time_seconds = round(end_time - start_time, 2)
@@ -67,87 +121,143 @@ class MessageHandler:
     
     async def process_message_stream(
         self,
-        messages: List[Dict[str, str]],
+        messages: List[ChatMessage],
         provider: str = "openrouter",
         model: Optional[str] = None,
-        action: str = ""
+        action: str = "",
+        flush_interval_ms: int = StreamingConfig.FLUSH_INTERVAL_MS,
+        flush_chars: int = StreamingConfig.FLUSH_CHARS,
     ):
         """
         Process a message with streaming and yield partial responses.
-        For search models, uses non-streaming to get citations properly.
+        Search citations are collected from the stream as they arrive.
+        
+        Partial updates are coalesced: one is yielded once flush_interval_ms
+        has passed or flush_chars new characters arrived since the last one.
+        
+        With the response cache enabled, a repeated request is replayed from
+        the cache as the same sequence of updates.
+        
+        Time to first token, inter-token gaps, duration, provider-reported
+        token usage and payload size are exported as metrics and attached to
+        the final message.
         
         Yields:
             Tuple of (partial_message_dict, is_complete)
         """
-        # Check if this is a search model that needs citations
-        is_search_model = (
-            model and 
-            (model.lower().startswith("perplexity/") or "sonar" in model.lower()) and
-            action == "Search"
-        )
-        
-        if is_search_model:
-            # Use non-streaming for search models to get citations properly
-            message_dict = self.process_message(messages, provider, model, action)
-            yield message_dict, True
-            return
         start_time = time.time()
+        wire_messages = self.to_wire_messages(messages)
+        metrics = GenerationMetrics(provider, model)
         
-        # Make the streaming API call
-        stream = self.provider_manager.chat_completion_stream(
-            messages=messages,
-            provider_name=provider,
-            model=model
+        # Sent with the request and hashed into the cache key, along with the
+        # action, so requests differing in either never share an entry
+        request_params = {"stream_options": {"include_usage": True}}
+        cache_key = response_cache.make_key(
+            provider,
+            model,
+            self.provider_manager.default_system_message,
+            wire_messages,
+            {**request_params, "action": action.lower()},
         )
+        cached_message = await response_cache.get(cache_key)
+        if cached_message:
+            metrics.finish(outcome="cached")
+            async for update in self._replay_cached(cached_message, start_time, flush_chars):
+                yield update
+            return
+        
+        try:
+            # Make the streaming API call; the last chunk carries token usage
+            stream = await self.provider_manager.achat_completion_stream(
+                messages=wire_messages,
+                provider_name=provider,
+                model=model,
+                **request_params,
+            )
+        except Exception:
+            metrics.finish(outcome="error")
+            raise
+        served_by = getattr(stream, "target", None)
+        # Size of the trimmed, rehydrated messages the serving target was sent
+        metrics.request_bytes = getattr(stream, "request_bytes", 0)
         
-        # Initialize accumulation variables
-        accumulated_content = ""
-        accumulated_reasoning = ""
-        accumulated_annotations = []
+        # Route content into thinking/answer buffers as it arrives
+        parser = ThinkTagParser()
+        reasoning_parts = []
+        # Insertion-ordered set of citation URLs gathered across chunks
+        citations: Dict[str, None] = {}
         usage_info = None
-        final_response_message = None
+        
+        # Coalesce partial updates so snapshots are only built on a time/size budget
+        last_flush = time.monotonic()
+        unflushed_chars = 0
         
         # Process the stream
-        for chunk in stream:
-            if chunk.choices and len(chunk.choices) > 0:
-                choice = chunk.choices[0]
-                delta = choice.delta
-                
-                # Check if this is the end of the stream
-                finish_reason = getattr(choice, 'finish_reason', None)
-                
-                # Accumulate content
-                if hasattr(delta, 'content') and delta.content:
-                    accumulated_content += delta.content
+        try:
+            async for chunk in stream:
+                if chunk.choices and len(chunk.choices) > 0:
+                    choice = chunk.choices[0]
+                    delta = choice.delta
                     
-                    # Build partial message for streaming display
-                    partial_message = {
-                        "role": "assistant",
-                        "content": accumulated_content,
-                        "display_text": accumulated_content,
-                    }
+                    # Collect url_citation annotations streamed in the delta or final message
+                    self._collect_citations(getattr(delta, 'annotations', None), citations)
+                    final_message_obj = getattr(choice, 'message', None)
+                    if final_message_obj is not None:
+                        self._collect_citations(getattr(final_message_obj, 'annotations', None), citations)
                     
-                    if accumulated_reasoning:
-                        partial_message["thinking"] = accumulated_reasoning
+                    # Accumulate content
+                    if hasattr(delta, 'content') and delta.content:
+                        metrics.token()
+                        parser.feed(delta.content)
+                        unflushed_chars += len(delta.content)
                     
-                    # Yield partial update only when we have new content
-                    yield partial_message, False
-                
-                # Accumulate reasoning (for OpenRouter models)
-                if hasattr(delta, 'reasoning') and delta.reasoning:
-                    accumulated_reasoning += delta.reasoning
+                    # Accumulate reasoning (for OpenRouter models)
+                    if hasattr(delta, 'reasoning') and delta.reasoning:
+                        metrics.token()
+                        reasoning_parts.append(delta.reasoning)
+                        unflushed_chars += len(delta.reasoning)
+                    
+                    now = time.monotonic()
+                    if unflushed_chars and (
+                        unflushed_chars >= flush_chars
+                        or (now - last_flush) * 1000 >= flush_interval_ms
+                    ):
+                        # Build partial message for streaming display
+                        display_text = parser.display_text
+                        partial_message = {
+                            "role": "assistant",
+                            "content": display_text,
+                            "display_text": display_text,
+                        }
+                        
+                        thinking_so_far = "".join(reasoning_parts) or parser.thinking
+                        if thinking_so_far:
+                            partial_message["thinking"] = thinking_so_far
+                        if citations:
+                            partial_message["citations"] = list(citations)
+                        
+                        last_flush = now
+                        unflushed_chars = 0
+                        yield partial_message, False
+                    
+                # Perplexity sends its sources as a top-level citations list on chunks
+                self._collect_citations(getattr(chunk, 'citations', None), citations)
                 
+                # Capture usage info; with include_usage it arrives in a final
+                # chunk after the finish_reason, so keep reading to the end
+                if hasattr(chunk, 'usage') and chunk.usage:
+                    usage_info = chunk.usage
                 
-                # If stream is finished, capture the final message for annotations
+                finish_reason = chunk.choices[0].finish_reason if chunk.choices else None
                 if finish_reason:
-                    if hasattr(choice, 'message'):
-                        final_response_message = choice.message
                     print(f"Stream finished with reason: {finish_reason}")
-                    break
-            
-            # Capture usage info if available
-            if hasattr(chunk, 'usage') and chunk.usage:
-                usage_info = chunk.usage
+        except Exception:
+            metrics.finish(served_by=served_by, outcome="error")
+            raise
+        
+        metrics.finish(usage_info, served_by)
+        parser.finish()
+        actual_response = parser.display_text
         
         # Calculate final timing metrics
         end_time = time.time()
@@ -156,69 +266,86 @@ class MessageHandler:
         
         # Extract final token usage
         current_response_tokens = (
-            usage_info.completion_tokens
-            if usage_info and hasattr(usage_info, 'completion_tokens')
-            else len(accumulated_content.split()) # Rough estimate if no usage info
+            metrics.completion_tokens
+            if metrics.completion_tokens is not None
+            else len(actual_response.split()) # Rough estimate if no usage info
         )
         
         tokens_per_second = self._calculate_tokens_per_second(
             current_response_tokens, generation_time_seconds
         )
         
-        # Process thinking content
-        thinking_content = None
-        actual_response = accumulated_content
-        
-        if accumulated_reasoning:
-            thinking_content = accumulated_reasoning.strip()
-        else:
-            # Check for <think> tags in content only (no response object available in streaming)
-            think_pattern = r"<think>(.*?)</think>"
-            think_match = re.search(think_pattern, accumulated_content, re.DOTALL)
-            
-            if think_match:
-                thinking_content = think_match.group(1).strip()
-                actual_response = re.sub(
-                    think_pattern, "", accumulated_content, flags=re.DOTALL
-                ).strip()
-            else:
-                thinking_content = None
-        
-        
-        # Extract citations from annotations in the final message
-        citations = []
-        if final_response_message and hasattr(final_response_message, 'annotations'):
-            annotations = final_response_message.annotations or []
-            print(f"Found {len(annotations)} annotations in final message")
-            
-            # Convert OpenRouter annotations to citation URLs
-            for annotation in annotations:
-                if (hasattr(annotation, 'type') and annotation.type == 'url_citation' and 
-                    hasattr(annotation, 'url_citation') and hasattr(annotation.url_citation, 'url')):
-                    citations.append(annotation.url_citation.url)
-                    print(f"Extracted citation: {annotation.url_citation.url}")
-        
-        # For non-search models, citations from streaming are not expected
-        if not citations:
-            print("No citations expected for this model/action combination")
+        # Prefer the provider's reasoning field, then <think> tags from the content
+        thinking_content = "".join(reasoning_parts).strip() or parser.thinking or None
+        
+        
+        if citations:
+            print(f"Collected {len(citations)} citations from stream")
         
         # Build final message dictionary manually for streaming
         final_message: ChatMessage = {
             "role": "assistant",
             "content": actual_response,
             "display_text": actual_response,
-            "citations": citations,
+            "citations": list(citations),
             "generation_time": generation_time,
             "total_tokens": current_response_tokens,
             "tokens_per_second": tokens_per_second,
+            **metrics.message_fields(),
         }
         
         if thinking_content:
             final_message["thinking"] = thinking_content
         
+        # Only cache answers from the requested model, not from a fallback
+        if not (model and served_by and served_by[1] != model):
+            is_search = action.lower() == "search" or model_catalog.is_search_model(model)
+            response_cache.store(cache_key, final_message, is_search)
+        
         # Yield final complete message
         yield final_message, True
     
+    async def _replay_cached(
+        self, cached_message: Dict[str, Any], start_time: float, flush_chars: int
+    ):
+        """Yield a cached answer like a live stream: growing partials, then the final message."""
+        display_text = cached_message.get("display_text", "")
+        for end in range(flush_chars, len(display_text), flush_chars):
+            partial_message = {
+                "role": "assistant",
+                "content": display_text[:end],
+                "display_text": display_text[:end],
+            }
+            if cached_message.get("thinking"):
+                partial_message["thinking"] = cached_message["thinking"]
+            yield partial_message, False
+            # Let each partial reach the UI as its own update
+            await asyncio.sleep(0)
+        
+        generation_time_seconds = round(time.time() - start_time, 2)
+        final_message: ChatMessage = {
+            "role": "assistant",
+            "citations": [],
+            **cached_message,
+            "generation_time": f"{generation_time_seconds}s",
+            "tokens_per_second": self._calculate_tokens_per_second(
+                cached_message.get("total_tokens", 0), generation_time_seconds
+            ),
+        }
+        yield final_message, True
+    
+    
+    def _collect_citations(self, items, citations: Dict[str, None]) -> None:
+        """
+        Add citation URLs to an ordered, de-duplicated collection.
+        
+        Accepts url_citation annotations (as SDK objects or the raw dicts
+        streamed in deltas) and plain URL strings from a citations list.
+        """
+        for item in items or []:
+            url = item if isinstance(item, str) else _annotation_url(item)
+            if url and url not in citations:
+                citations[url] = None
     
     def _extract_tokens(self, response) -> int:
         """Extract token count from response."""
@@ -248,14 +375,13 @@ class MessageHandler:
             return thinking_content, actual_response
         
         # Method 1: Check for thinking tokens in the format <think>...</think>
-        think_pattern = r"<think>(.*?)</think>"
-        think_match = re.search(think_pattern, response_text, re.DOTALL)
-        
-        if think_match:
-            thinking_content = think_match.group(1).strip()
-            actual_response = re.sub(
-                think_pattern, "", response_text, flags=re.DOTALL
-            ).strip()
+        parser = ThinkTagParser()
+        parser.feed(response_text)
+        parser.finish()
+        
+        if parser.thinking:
+            thinking_content = parser.thinking
+            actual_response = parser.display_text
         # Method 2: Check for reasoning parameter in OpenRouter responses
         elif (
             hasattr(response.choices[0].message, "reasoning")
@@ -276,26 +402,20 @@ class MessageHandler:
         response
     ) -> ChatMessage:
         """Build the message dictionary."""
-        # Extract citations from OpenRouter annotations
-        citations = []
+        # Extract citations from OpenRouter annotations and top-level citations
+        citations: Dict[str, None] = {}
         if (hasattr(response, 'choices') and response.choices and
-            hasattr(response.choices[0], 'message') and
-            hasattr(response.choices[0].message, 'annotations')):
-            
-            annotations = response.choices[0].message.annotations or []
-            print(f"Found {len(annotations)} annotations in non-streaming response")
-            
-            for annotation in annotations:
-                if (hasattr(annotation, 'type') and annotation.type == 'url_citation' and 
-                    hasattr(annotation, 'url_citation') and hasattr(annotation.url_citation, 'url')):
-                    citations.append(annotation.url_citation.url)
-                    print(f"Extracted citation: {annotation.url_citation.url}")
+            hasattr(response.choices[0], 'message')):
+            self._collect_citations(
+                getattr(response.choices[0].message, 'annotations', None), citations
+            )
+        self._collect_citations(getattr(response, 'citations', None), citations)
         
         message_dict: ChatMessage = {
             "role": "assistant",
             "content": actual_response,  # Keep as string for UI compatibility
             "display_text": actual_response,  # Add display_text field
-            "citations": citations,
+            "citations": list(citations),
             "generation_time": generation_time,
             "total_tokens": current_response_tokens,
             "tokens_per_second": tokens_per_second,
@@ -307,5 +427,26 @@ class MessageHandler:
         return message_dict
 
 
+def _annotation_url(annotation) -> Optional[str]:
+    """Return the URL of a url_citation annotation, or None for other annotations."""
+    if isinstance(annotation, dict):
+        if annotation.get("type") != "url_citation":
+            return None
+        return (annotation.get("url_citation") or {}).get("url")
+    if getattr(annotation, "type", None) != "url_citation":
+        return None
+    return getattr(getattr(annotation, "url_citation", None), "url", None)
+
+
+def _plain(value):
+    """Copy a JSON value out of any Reflex state proxies into plain dicts and lists."""
+    value = getattr(value, "__wrapped__", value)
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
 # Global message handler instance
 message_handler = MessageHandler()
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Exact-match cache of final assistant responses.
+"""
+import json
+import time
+import hashlib
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from ark.config import ResponseCacheConfig
+from ark.models.chat import ChatMessage
+
+# Fields of the final ChatMessage worth replaying; timing is measured afresh
+CACHED_FIELDS = ("content", "display_text", "thinking", "citations", "total_tokens")
+
+
+class ResponseCacheBackend(ABC):
+    """Storage for cached responses."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached message for key, or None if missing or expired."""
+
+    @abstractmethod
+    async def set(self, key: str, message: Dict[str, Any], ttl_seconds: int):
+        """Store a message under key for ttl_seconds."""
+
+
+class MemoryResponseCache(ResponseCacheBackend):
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = ResponseCacheConfig.MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, message = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return message
+
+    async def set(self, key: str, message: Dict[str, Any], ttl_seconds: int):
+        self._entries[key] = (time.time() + ttl_seconds, message)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class PostgresResponseCache(ResponseCacheBackend):
+    """Shared cache in the response_cache table, so every app instance benefits."""
+
+    # Expired rows are purged on every Nth write
+    PURGE_EVERY = 100
+
+    def __init__(self):
+        self._writes = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from ark.database.utils import acquire
+
+        try:
+            async with acquire() as conn:
+                message = await conn.fetchval(
+                    "SELECT message FROM response_cache WHERE key = $1 AND expires_at > NOW()",
+                    key,
+                )
+            return message
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            return None
+
+    async def set(self, key: str, message: Dict[str, Any], ttl_seconds: int):
+        from ark.database.utils import acquire
+
+        try:
+            async with acquire() as conn:
+                await conn.execute(
+                    """
+                    INSERT INTO response_cache (key, message, expires_at)
+                    VALUES ($1, $2::jsonb, NOW() + make_interval(secs => $3))
+                    ON CONFLICT (key) DO UPDATE
+                    SET message = EXCLUDED.message, expires_at = EXCLUDED.expires_at
+                    """,
+                    key,
+                    message,
+                    float(ttl_seconds),
+                )
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    await conn.execute("DELETE FROM response_cache WHERE expires_at <= NOW()")
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+
+
+class ResponseCache:
+    """
+    Opt-in exact-match cache in front of the provider.
+
+    Keys hash the provider, model, system prompt, whitespace-normalized
+    message text and request params. Only text-only conversations are
+    cached: attachment URLs aren't stable and hashing their payloads on
+    every send would cost more than it saves.
+    """
+
+    def __init__(
+        self,
+        backend: ResponseCacheBackend,
+        enabled: bool = ResponseCacheConfig.ENABLED,
+        ttl_seconds: int = ResponseCacheConfig.TTL_SECONDS,
+        search_ttl_seconds: int = ResponseCacheConfig.SEARCH_TTL_SECONDS,
+    ):
+        self.backend = backend
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.search_ttl_seconds = search_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # Background writes, referenced until done so they aren't collected early
+        self._pending_writes: Set[asyncio.Task] = set()
+
+    def make_key(
+        self,
+        provider: str,
+        model: Optional[str],
+        system_prompt: str,
+        messages: List[Dict[str, Any]],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Optional[str]:
+        """Cache key for a request, or None if it shouldn't be cached."""
+        if not self.enabled:
+            return None
+
+        normalized = []
+        for message in messages:
+            text = _message_text(message.get("content"))
+            if text is None:
+                return None
+            normalized.append([message.get("role"), text])
+
+        payload = json.dumps(
+            [provider, model or "", system_prompt, normalized, params or {}],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, is_search: bool) -> int:
+        """Search answers go stale faster than chat answers."""
+        return self.search_ttl_seconds if is_search else self.ttl_seconds
+
+    async def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        message = await self.backend.get(key)
+        if message is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return message
+
+    def store(self, key: Optional[str], message: ChatMessage, is_search: bool = False):
+        """Save a final message in the background without delaying the reply."""
+        if key is None or not message.get("content"):
+            return
+        cached = {field: message[field] for field in CACHED_FIELDS if field in message}
+        task = asyncio.create_task(self.backend.set(key, cached, self.ttl_for(is_search)))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task):
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error writing response cache: {task.exception()}")
+
+
+def _message_text(content) -> Optional[str]:
+    """Whitespace-normalized text of a message, or None if it has attachments."""
+    if isinstance(content, str):
+        return " ".join(content.split())
+    parts = []
+    for part in content or []:
+        if part.get("type") != "text":
+            return None
+        parts.append(part.get("text", ""))
+    return " ".join(" ".join(parts).split())
+
+
+def _create_backend() -> ResponseCacheBackend:
+    if ResponseCacheConfig.BACKEND == "postgres":
+        return PostgresResponseCache()
+    return MemoryResponseCache()
+
+
+# Global response cache instance
+response_cache = ResponseCache(_create_backend())
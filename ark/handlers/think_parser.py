@@ -0,0 +1,88 @@
+"""
+Incremental parser that separates <think>...</think> reasoning from answer text.
+"""
+from typing import List
+
+
+class ThinkTagParser:
+    """
+    Routes streamed text into thinking and display buffers as it arrives.
+
+    Tags may be split across chunks, so a trailing fragment that could be the
+    start of a tag is held back until the next chunk decides it. Text is kept
+    in lists and only joined when a snapshot is requested.
+
+    A <think> block the stream never closes (a truncated or misbehaving
+    model) becomes the answer if there is no other answer text, so the
+    reply isn't left empty; otherwise it stays reasoning.
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._thinking: List[str] = []
+        self._display: List[str] = []
+        self._in_think = False
+        self._pending = ""
+        self._block_start = 0  # index in _thinking where the open block began
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next piece of streamed text."""
+        if not chunk:
+            return
+
+        text = self._pending + chunk
+        self._pending = ""
+        pos = 0
+
+        while pos < len(text):
+            tag = self.CLOSE_TAG if self._in_think else self.OPEN_TAG
+            index = text.find(tag, pos)
+
+            if index == -1:
+                # Hold back a suffix that may be the beginning of the tag
+                keep = self._partial_tag_length(text, tag, pos)
+                end = len(text) - keep
+                self._emit(text[pos:end])
+                self._pending = text[end:]
+                return
+
+            self._emit(text[pos:index])
+            self._in_think = not self._in_think
+            self._block_start = len(self._thinking)
+            pos = index + len(tag)
+
+    def finish(self) -> None:
+        """Flush any held-back text once the stream has ended."""
+        if self._pending:
+            self._emit(self._pending)
+            self._pending = ""
+
+        if self._in_think:
+            self._in_think = False
+            if not self.display_text:
+                self._display.extend(self._thinking[self._block_start:])
+                del self._thinking[self._block_start:]
+
+    @property
+    def thinking(self) -> str:
+        """Reasoning text seen so far, stripped."""
+        return "".join(self._thinking).strip()
+
+    @property
+    def display_text(self) -> str:
+        """Answer text seen so far with think blocks removed, stripped."""
+        return "".join(self._display).strip()
+
+    def _emit(self, text: str) -> None:
+        if text:
+            (self._thinking if self._in_think else self._display).append(text)
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str, start: int) -> int:
+        """Length of the longest suffix of text[start:] that is a proper prefix of tag."""
+        for length in range(min(len(tag) - 1, len(text) - start), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
@@ -12,6 +12,7 @@ class FileReference(TypedDict, total=False):
     filename: Optional[str]  # For base64 files
     content_type: str
     file_size: Optional[int]
+    content_hash: Optional[str]  # SHA-256 of R2 file content
     type: Optional[str]  # "image" or "pdf"
     presigned_url: Optional[str]  # For R2 files
     base64_url: Optional[str]  # For base64 files
@@ -26,4 +27,9 @@ class ChatMessage(TypedDict, total=False):
     total_tokens: int
     tokens_per_second: float
     thinking: str
+    provider: str  # Provider and model that generated the message
+    model: str
+    time_to_first_token: float  # Seconds
+    prompt_tokens: int
+    request_bytes: int  # Size of the request messages
     files: List[FileReference]  # File references instead of embedded base64
\ No newline at end of file
@@ -1,10 +1,23 @@
 """
 Provider configuration model definition.
 """
-from typing import TypedDict, Optional
+from typing import TypedDict, Optional, List
 
 
 class ProviderConfig(TypedDict):
     base_url: str
     api_key: str
-    default_model: Optional[str]
\ No newline at end of file
+    default_model: Optional[str]
+
+class ModelInfo(TypedDict):
+    """Catalog metadata for one model."""
+    id: str
+    name: str
+    context_length: int
+    input_modalities: List[str]  # e.g. ["text", "image", "file"]
+    output_modalities: List[str]
+    supports_tools: bool
+    supports_reasoning: bool
+    supports_web_search: bool
+    prompt_price: float  # USD per token
+    completion_price: float  # USD per token
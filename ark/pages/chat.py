@@ -136,6 +136,7 @@ def chat_nav():
     return navigation_header(
         provider_name=State.selected_provider,
         model_name=State.selected_model,
+        model_options=State.model_options,
         new_chat_handler=[
             rx.redirect("/"),
             State.reset_chat,
@@ -565,11 +566,38 @@ def chat_input():
     )
 
 
+def load_earlier_button():
+    """Button above the history that loads the previous page of a long chat"""
+    return rx.cond(
+        State.has_earlier_messages,
+        rx.center(
+            rx.button(
+                "Load earlier messages",
+                on_click=State.load_earlier_messages,
+                loading=State.is_loading_earlier,
+                variant="ghost",
+                class_name=rx.cond(
+                    State.is_dark_theme,
+                    "font-[dm] text-neutral-400 hover:text-neutral-200",
+                    "font-[dm] text-gray-500 hover:text-gray-800",
+                ),
+            ),
+            class_name="w-full py-2",
+        ),
+    )
+
+
 def chat_messages():
     return rx.box(
+        load_earlier_button(),
         rx.foreach(
             State.messages,
             lambda message, index: response_message(message, index),
         ),
+        # In-flight assistant message, rendered after the history while streaming
+        rx.cond(
+            State.streaming_message.get("role"),
+            response_message(State.streaming_message, State.messages.length()),
+        ),
         class_name="flex-1 overflow-y-scroll p-4 md:p-6 space-y-4 max-w-4xl mx-auto w-full pb-24 md:pb-32 hide-scrollbar",
     )
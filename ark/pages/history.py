@@ -3,11 +3,34 @@ from ark.state import State
 import reflex_clerk_api as clerk
 
 
+# Clicks the "load more" sentinel whenever it scrolls into view. The sentinel is
+# re-keyed by cursor, so each new page gets a fresh element to observe.
+INFINITE_SCROLL_SCRIPT = """
+(function () {
+    const observer = new IntersectionObserver(
+        (entries) => entries.forEach((entry) => entry.isIntersecting && entry.target.click()),
+        { rootMargin: "200px" }
+    );
+    const watch = () => {
+        const sentinel = document.getElementById("load-more-chats");
+        if (sentinel && !sentinel.dataset.observed) {
+            sentinel.dataset.observed = "true";
+            observer.observe(sentinel);
+        }
+    };
+    new MutationObserver(watch).observe(document.body, { childList: true, subtree: true });
+    watch();
+})();
+"""
+
+
 def search_bar():
     """Search bar component for filtering chat history"""
     return rx.box(
         rx.input(
             placeholder="Search conversations...",
+            default_value=State.search_query,
+            on_change=State.search_chats.debounce(300),
             class_name=rx.cond(
                 State.is_dark_theme,
                 "w-full h-14 bg-neutral-900/70 border border-neutral-700/60 rounded-2xl pl-4 pr-4 py-3.5 text-neutral-100 placeholder-neutral-500 focus:border-neutral-600 focus:bg-neutral-900/90 focus:ring-0 focus:outline-none transition-all duration-300 backdrop-blur-sm",
@@ -77,6 +100,18 @@ def chat_history_item(chat):
                         "textOverflow": "ellipsis",
                     },
                 ),
+                # Highlighted match from full-text search (escaped server-side)
+                rx.cond(
+                    chat["snippet"],
+                    rx.html(
+                        chat["snippet"],
+                        class_name=rx.cond(
+                            State.is_dark_theme,
+                            "text-neutral-300 text-sm line-clamp-2 [&_mark]:bg-amber-500/40 [&_mark]:text-neutral-100",
+                            "text-gray-700 text-sm line-clamp-2 [&_mark]:bg-amber-200",
+                        ),
+                    ),
+                ),
                 rx.text(
                     chat["updated_at"],
                     class_name=rx.cond(
@@ -201,21 +236,96 @@ def empty_state_no_chats():
     )
 
 
+def load_more_sentinel(has_more, cursor, on_click):
+    """Button at the end of the list that loads the next page when scrolled into view"""
+    return rx.cond(
+        has_more,
+        rx.center(
+            rx.button(
+                "Load more",
+                id="load-more-chats",
+                key=cursor,
+                on_click=on_click,
+                loading=State.is_loading_chats,
+                variant="ghost",
+                class_name=rx.cond(
+                    State.is_dark_theme,
+                    "text-neutral-400 hover:text-neutral-200",
+                    "text-gray-500 hover:text-gray-800",
+                ),
+            ),
+            class_name="w-full py-4",
+        ),
+    )
+
+
+def empty_state_no_results():
+    """Empty state when a search matches no chats"""
+    return rx.center(
+        rx.vstack(
+            rx.icon(
+                "search-x",
+                size=48,
+                class_name=rx.cond(
+                    State.is_dark_theme,
+                    "text-neutral-500 mb-4",
+                    "text-gray-400 mb-4",
+                ),
+            ),
+            rx.text(
+                "No matching conversations",
+                class_name=rx.cond(
+                    State.is_dark_theme,
+                    "text-neutral-400 text-lg font-medium",
+                    "text-gray-600 text-lg font-medium",
+                ),
+            ),
+            spacing="2",
+            align="center",
+            class_name="py-16",
+        ),
+        class_name="w-full",
+    )
+
+
 def chat_history_list():
     """List of chat history items"""
     return rx.cond(
         clerk.ClerkState.is_signed_in,
-        # User is logged in - show chats or empty state
+        # User is logged in - show search results, chats or empty state
         rx.cond(
-            State.user_chats,
-            # User has chats
-            rx.vstack(
-                rx.foreach(State.user_chats, chat_history_item),
-                spacing="3",
-                class_name="w-full",
+            State.search_query,
+            # User is searching
+            rx.cond(
+                State.search_results,
+                rx.vstack(
+                    rx.foreach(State.search_results, chat_history_item),
+                    load_more_sentinel(
+                        State.has_more_search_results,
+                        State.search_cursor,
+                        State.load_more_search_results,
+                    ),
+                    spacing="3",
+                    class_name="w-full",
+                ),
+                empty_state_no_results(),
+            ),
+            rx.cond(
+                State.user_chats,
+                # User has chats
+                rx.vstack(
+                    rx.foreach(State.user_chats, chat_history_item),
+                    load_more_sentinel(
+                        State.has_more_chats,
+                        State.chats_cursor,
+                        State.load_more_chats,
+                    ),
+                    spacing="3",
+                    class_name="w-full",
+                ),
+                # User has no chats
+                empty_state_no_chats(),
             ),
-            # User has no chats
-            empty_state_no_chats(),
         ),
         # User is not logged in
         empty_state_not_logged_in(),
@@ -252,6 +362,7 @@ def chat_count_info():
                 rx.text(
                     "You have ",
                     State.user_chats.length(),
+                    rx.cond(State.has_more_chats, "+", ""),
                     " previous chats",
                     class_name=rx.cond(
                         State.is_dark_theme,
@@ -276,6 +387,7 @@ def history_nav():
             search_bar(),
             chat_count_info(),
             chat_history_list(),
+            rx.script(INFINITE_SCROLL_SCRIPT),
             class_name="w-full max-w-4xl mx-auto px-4 py-6 md:py-8",
         ),
         class_name="min-h-screen pt-4 md:pt-8",
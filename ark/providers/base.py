@@ -3,7 +3,7 @@ Base provider interface and common functionality.
 """
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from ark.models.provider import ProviderConfig
 
 
@@ -16,6 +16,13 @@ class BaseProvider(ABC):
             base_url=config["base_url"],
             api_key=config["api_key"],
         )
+        # Used by the a* methods so requests don't block the event loop.
+        # Retries are handled by ProviderManager, which can also fail over.
+        self.async_client = AsyncOpenAI(
+            base_url=config["base_url"],
+            api_key=config["api_key"],
+            max_retries=0,
+        )
     
     @abstractmethod
     def get_available_models(self) -> List[str]:
@@ -27,24 +34,32 @@ class BaseProvider(ABC):
         """Check if the provider is connected and available."""
         pass
     
-    def chat_completion(
-        self, 
-        messages: List[Dict[str, str]], 
-        model: Optional[str] = None,
+    def _completion_kwargs(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
         **kwargs
-    ):
-        """Create a chat completion."""
+    ) -> Dict[str, Any]:
+        """Build the request arguments shared by all completion methods."""
         model = model or self.config["default_model"]
         
         if model is None:
             raise ValueError(f"Model selection is required for {self.__class__.__name__}")
         
-        completion_kwargs = {
+        return {
             "model": model,
             "messages": messages,
             **kwargs
         }
-        
+    
+    def chat_completion(
+        self, 
+        messages: List[Dict[str, str]], 
+        model: Optional[str] = None,
+        **kwargs
+    ):
+        """Create a chat completion."""
+        completion_kwargs = self._completion_kwargs(messages, model, **kwargs)
         return self.client.chat.completions.create(**completion_kwargs)
     
     def chat_completion_stream(
@@ -54,19 +69,28 @@ class BaseProvider(ABC):
         **kwargs
     ):
         """Create a streaming chat completion."""
-        model = model or self.config["default_model"]
-        
-        if model is None:
-            raise ValueError(f"Model selection is required for {self.__class__.__name__}")
-        
-        completion_kwargs = {
-            "model": model,
-            "messages": messages,
-            "stream": True,
-            **kwargs
-        }
-        
+        completion_kwargs = self._completion_kwargs(messages, model, stream=True, **kwargs)
         return self.client.chat.completions.create(**completion_kwargs)
+    
+    async def achat_completion(
+        self, 
+        messages: List[Dict[str, str]], 
+        model: Optional[str] = None,
+        **kwargs
+    ):
+        """Create a chat completion without blocking the event loop."""
+        completion_kwargs = self._completion_kwargs(messages, model, **kwargs)
+        return await self.async_client.chat.completions.create(**completion_kwargs)
+    
+    async def achat_completion_stream(
+        self, 
+        messages: List[Dict[str, str]], 
+        model: Optional[str] = None,
+        **kwargs
+    ):
+        """Create a streaming chat completion, returning an async iterator of chunks."""
+        completion_kwargs = self._completion_kwargs(messages, model, stream=True, **kwargs)
+        return await self.async_client.chat.completions.create(**completion_kwargs)
 
 
 class ProviderRegistry:
@@ -0,0 +1,196 @@
+"""
+Catalog of models offered by OpenRouter, with cached metadata.
+"""
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from ark.config import ModelCatalogConfig, ModelConfig
+from ark.models.provider import ModelInfo
+
+
+class ModelCatalog:
+    """
+    Model metadata fetched from the provider's /models endpoint.
+
+    The last-known catalog is loaded from disk at startup so nothing waits on
+    the network; a background task refreshes it once it is older than
+    refresh_interval and writes it back. Lookups return None for unknown
+    models so callers can fall back to their own defaults.
+    """
+
+    def __init__(self, cache_path: str, refresh_interval: int):
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.fetched_at = 0.0
+        self._models: Dict[str, ModelInfo] = {}
+        self._load()
+
+    def _load(self):
+        """Load the last-known catalog from disk, if any."""
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            self._models = {model["id"]: model for model in data["models"]}
+            self.fetched_at = data["fetched_at"]
+            print(f"Loaded {len(self._models)} models from catalog cache")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading model catalog cache: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"fetched_at": self.fetched_at, "models": list(self._models.values())}, f)
+        os.replace(temp_path, self.cache_path)
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self.fetched_at >= self.refresh_interval
+
+    async def refresh(self, client) -> bool:
+        """
+        Fetch the catalog with an OpenAI-compatible async client and persist it.
+
+        Returns:
+            True if the catalog was updated
+        """
+        try:
+            models = {}
+            async for entry in client.models.list():
+                info = _parse_model(entry.to_dict())
+                models[info["id"]] = info
+            if not models:
+                return False
+
+            self._models = models
+            self.fetched_at = time.time()
+            await asyncio.to_thread(self._save)
+            print(f"Refreshed model catalog: {len(models)} models")
+            return True
+        except Exception as e:
+            print(f"Error refreshing model catalog: {e}")
+            return False
+
+    def get(self, model: Optional[str]) -> Optional[ModelInfo]:
+        return self._models.get(model or "")
+
+    def model_ids(self) -> List[str]:
+        return list(self._models)
+
+    def context_length(self, model: Optional[str]) -> Optional[int]:
+        info = self.get(model)
+        return info["context_length"] if info and info["context_length"] else None
+
+    def supports_tools(self, model: Optional[str]) -> Optional[bool]:
+        info = self.get(model)
+        return info["supports_tools"] if info else None
+
+    def is_search_model(self, model: Optional[str]) -> bool:
+        """Whether a model answers from live web search (Perplexity, :online variants)."""
+        info = self.get(model)
+        if info and info["supports_web_search"]:
+            return True
+        model = (model or "").lower()
+        return model.startswith("perplexity/") or model.endswith(":online")
+
+    def chat_models(self) -> List[ModelInfo]:
+        """
+        Models that take and return text, sorted by name, for the model picker.
+
+        The cache file is only read at startup and written by refresh(); until
+        a catalog exists this is just the configured default models.
+        """
+        models = [
+            info
+            for info in self._models.values()
+            if "text" in info["input_modalities"] and "text" in info["output_modalities"]
+        ]
+        if not models:
+            defaults = dict.fromkeys([ModelConfig.CHAT_MODEL, ModelConfig.SEARCH_MODEL])
+            return [_placeholder(model) for model in defaults]
+        return sorted(models, key=lambda info: info["name"].lower())
+
+
+def _parse_model(entry: Dict[str, Any]) -> ModelInfo:
+    """Map an OpenRouter /models entry onto ModelInfo."""
+    architecture = entry.get("architecture") or {}
+    parameters = set(entry.get("supported_parameters") or [])
+    pricing = entry.get("pricing") or {}
+
+    input_modalities = architecture.get("input_modalities")
+    output_modalities = architecture.get("output_modalities")
+    if input_modalities is None or output_modalities is None:
+        # Older shape: "text+image->text"
+        inputs, _, outputs = (architecture.get("modality") or "text->text").partition("->")
+        input_modalities = input_modalities or inputs.split("+")
+        output_modalities = output_modalities or outputs.split("+")
+
+    return {
+        "id": entry["id"],
+        "name": entry.get("name") or entry["id"],
+        "context_length": int(entry.get("context_length") or 0),
+        "input_modalities": list(input_modalities),
+        "output_modalities": list(output_modalities),
+        "supports_tools": "tools" in parameters,
+        "supports_reasoning": bool(parameters & {"reasoning", "include_reasoning"}),
+        "supports_web_search": "web_search_options" in parameters,
+        "prompt_price": _price(pricing.get("prompt")),
+        "completion_price": _price(pricing.get("completion")),
+    }
+
+
+def _price(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _placeholder(model: str) -> ModelInfo:
+    return {
+        "id": model,
+        "name": model,
+        "context_length": 0,
+        "input_modalities": ["text"],
+        "output_modalities": ["text"],
+        "supports_tools": False,
+        "supports_reasoning": False,
+        "supports_web_search": False,
+        "prompt_price": 0.0,
+        "completion_price": 0.0,
+    }
+
+
+async def _refresh_periodically():
+    from ark.providers.manager import provider_manager
+
+    provider = provider_manager.get_provider("openrouter")
+    while True:
+        if model_catalog.is_stale:
+            await model_catalog.refresh(provider.async_client)
+        # Check again later; retry sooner if the last attempt failed
+        await asyncio.sleep(
+            model_catalog.refresh_interval if not model_catalog.is_stale
+            else ModelCatalogConfig.RETRY_SECONDS
+        )
+
+
+@asynccontextmanager
+async def catalog_lifespan() -> AsyncIterator[None]:
+    """Keep the catalog fresh in the background for the lifetime of the backend."""
+    task = asyncio.create_task(_refresh_periodically())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+# Global model catalog instance
+model_catalog = ModelCatalog(
+    ModelCatalogConfig.CACHE_PATH, ModelCatalogConfig.REFRESH_INTERVAL_SECONDS
+)
@@ -0,0 +1,149 @@
+"""
+Context window budgeting for provider requests.
+"""
+from typing import Any, Dict, List, Optional
+from ark.config import ContextConfig
+from .catalog import model_catalog
+
+# Rough token estimates; only need to be good enough to stay under the limit
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 1000
+PDF_TOKENS_PER_MB = 25000
+
+
+class ContextBuilder:
+    """
+    Fits a conversation into a model's context window before it is sent.
+
+    Attachments from older user turns are replaced with a short text
+    reference (the model already answered about them), then the oldest turns
+    are dropped until the estimate fits the budget. The system message and
+    the latest message are always kept.
+    """
+
+    def __init__(
+        self,
+        context_windows: Dict[str, int] = ContextConfig.CONTEXT_WINDOWS,
+        default_context_tokens: int = ContextConfig.DEFAULT_CONTEXT_TOKENS,
+        reserved_output_tokens: int = ContextConfig.RESERVED_OUTPUT_TOKENS,
+        max_prompt_tokens: int = ContextConfig.MAX_PROMPT_TOKENS,
+        keep_attachment_turns: int = ContextConfig.KEEP_ATTACHMENT_TURNS,
+    ):
+        self.context_windows = context_windows
+        self.default_context_tokens = default_context_tokens
+        self.reserved_output_tokens = reserved_output_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_attachment_turns = keep_attachment_turns
+
+    def context_limit(self, model: Optional[str]) -> int:
+        """Context window of a model in tokens, preferring the live catalog."""
+        return model_catalog.context_length(model) or self.context_windows.get(
+            model or "", self.default_context_tokens
+        )
+
+    def prompt_budget(self, model: Optional[str]) -> int:
+        """Tokens available for the prompt once the reply is reserved."""
+        available = self.context_limit(model) - self.reserved_output_tokens
+        return max(min(available, self.max_prompt_tokens), 0)
+
+    def build(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str],
+        budget: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the messages to send, trimmed to fit the budget.
+
+        The input list and its messages are not modified.
+
+        Args:
+            messages: Conversation in OpenAI format, optionally starting with a system message
+            model: Model the request is for
+            budget: Prompt token budget (default: prompt_budget(model))
+
+        Returns:
+            A new list of messages that fits the budget where possible
+        """
+        if budget is None:
+            budget = self.prompt_budget(model)
+
+        trimmed = self._elide_old_attachments(messages)
+
+        system = trimmed[:1] if trimmed and trimmed[0].get("role") == "system" else []
+        history = trimmed[len(system):]
+
+        costs = [estimate_message_tokens(message) for message in history]
+        total = sum(estimate_message_tokens(message) for message in system) + sum(costs)
+
+        # Drop the oldest turns, never the latest message
+        start = 0
+        while total > budget and start < len(history) - 1:
+            total -= costs[start]
+            start += 1
+        # Don't open the history with an assistant reply to a dropped question
+        while start < len(history) - 1 and history[start].get("role") != "user":
+            start += 1
+
+        if start:
+            print(
+                f"Context: dropped {start} of {len(history)} messages to fit "
+                f"{budget} tokens for {model}"
+            )
+        return system + history[start:]
+
+    def _elide_old_attachments(
+        self, messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Replace attachments outside the latest user turns with text references."""
+        user_turns_seen = 0
+        result = []
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                user_turns_seen += 1
+            content = message.get("content")
+            if user_turns_seen > self.keep_attachment_turns and isinstance(content, list):
+                message = {**message, "content": [_elide_part(part) for part in content]}
+            result.append(message)
+        result.reverse()
+        return result
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate the prompt tokens a message costs, including attachments."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return MESSAGE_OVERHEAD_TOKENS + len(content) // CHARS_PER_TOKEN
+    return MESSAGE_OVERHEAD_TOKENS + sum(
+        _estimate_part_tokens(part) for part in content or []
+    )
+
+
+def _estimate_part_tokens(part: Dict[str, Any]) -> int:
+    part_type = part.get("type")
+    if part_type == "text":
+        return len(part.get("text", "")) // CHARS_PER_TOKEN
+    if part_type == "image_url":
+        return IMAGE_TOKENS
+    if part_type == "file":
+        file = part.get("file", {})
+        # base64 inflates size by 4/3; R2 references carry their size instead
+        data_size = file.get("file_size") or len(file.get("file_data", "")) * 3 // 4
+        return max(data_size * PDF_TOKENS_PER_MB // (1024 * 1024), IMAGE_TOKENS)
+    return 0
+
+
+def _elide_part(part: Dict[str, Any]) -> Dict[str, Any]:
+    """Swap an attachment part for a short reference; other parts pass through."""
+    part_type = part.get("type")
+    if part_type == "image_url":
+        return {"type": "text", "text": "[Image attached earlier]"}
+    if part_type == "file":
+        filename = part.get("file", {}).get("filename", "document.pdf")
+        return {"type": "text", "text": f"[File attached earlier: {filename}]"}
+    return part
+
+
+# Global context builder instance
+context_builder = ContextBuilder()
@@ -2,11 +2,31 @@
 Provider manager for centralized AI provider handling.
 """
 
-from typing import Optional, List, Dict
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, List, Dict, AsyncIterator, Tuple
+from ark.config import ResilienceConfig
+from ark.services.attachments import rehydrate_messages
+from ark.services.metrics import payload_size
 from .base import ProviderRegistry, BaseProvider
+from .context import context_builder
+from .routing import (
+    CircuitBreaker,
+    EmptyStreamError,
+    LatencyTracker,
+    PrefetchedStream,
+    backoff_delay,
+    close_stream,
+    first_success,
+    is_retryable,
+    parse_fallback_chain,
+)
 from .openrouter import OpenRouterProvider
 from .prompt import system_message_prompt
 
+# A (provider name, model) pair a request can be routed to
+Target = Tuple[str, str]
+
 
 class ProviderManager:
     """Centralized manager for AI providers."""
@@ -15,11 +35,22 @@ class ProviderManager:
         self.registry = ProviderRegistry()
         self._initialize_providers()
         self._default_system_message = system_message_prompt
+        self._fallback_chain = parse_fallback_chain(ResilienceConfig.FALLBACK_CHAIN)
+        self._breaker = CircuitBreaker(
+            ResilienceConfig.BREAKER_FAILURE_THRESHOLD,
+            ResilienceConfig.BREAKER_RESET_SECONDS,
+        )
+        self._latency = LatencyTracker()
 
     def _initialize_providers(self):
         """Initialize and register all providers."""
         self.registry.register("openrouter", OpenRouterProvider())
 
+    @property
+    def default_system_message(self) -> str:
+        """System prompt prepended to conversations that don't carry their own."""
+        return self._default_system_message
+
     def get_provider(self, name: str) -> Optional[BaseProvider]:
         """Get a provider by name."""
         return self.registry.get(name)
@@ -39,55 +70,238 @@ class ProviderManager:
             return provider.get_available_models()
         return []
 
-    def chat_completion(
-        self,
-        messages: List[Dict[str, str]],
-        provider_name: str = "openrouter",
-        model: Optional[str] = None,
-        **kwargs,
-    ):
-        """Create a chat completion using specified provider."""
+    def _require_provider(self, provider_name: str) -> BaseProvider:
+        """Get a provider by name or raise if it isn't registered."""
         provider = self.get_provider(provider_name)
         if not provider:
             raise ValueError(f"Provider '{provider_name}' not found")
+        return provider
 
-        # Prepend system message if not already present
+    def _with_system_message(
+        self, messages: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """Prepend the default system message if not already present."""
         full_messages = messages.copy()
         if not full_messages or full_messages[0]["role"] != "system":
             full_messages.insert(
                 0, {"role": "system", "content": self._default_system_message}
             )
+        return full_messages
 
-        return provider.chat_completion(messages=full_messages, model=model, **kwargs)
+    def _prepare_messages(
+        self,
+        provider: BaseProvider,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+    ) -> List[Dict[str, str]]:
+        """Add the system message and fit the conversation to the model's context."""
+        return context_builder.build(
+            self._with_system_message(messages),
+            model or provider.config["default_model"],
+        )
 
-    def chat_completion_stream(
+    async def _aprepare_messages(
+        self,
+        provider: BaseProvider,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+    ) -> List[Dict[str, str]]:
+        """
+        _prepare_messages, then load the attachments that survived trimming
+
+        Stored messages reference their attachments in R2; only the ones
+        actually sent are fetched.
+        """
+        return await rehydrate_messages(self._prepare_messages(provider, messages, model))
+
+    async def achat_completion(
         self,
         messages: List[Dict[str, str]],
         provider_name: str = "openrouter",
         model: Optional[str] = None,
         **kwargs,
     ):
-        """Create a streaming chat completion using specified provider."""
-        provider = self.get_provider(provider_name)
-        if not provider:
-            raise ValueError(f"Provider '{provider_name}' not found")
+        """
+        Create a chat completion without blocking the event loop.
 
-        # Prepend system message if not already present
-        full_messages = messages.copy()
-        if not full_messages or full_messages[0]["role"] != "system":
-            full_messages.insert(
-                0, {"role": "system", "content": self._default_system_message}
+        Transient errors are retried with backoff, then the fallback chain is
+        tried in order.
+        """
+
+        async def attempt(target: Target):
+            provider = self._require_provider(target[0])
+            full_messages = await self._aprepare_messages(provider, messages, target[1])
+
+            if getattr(provider, "async_client", None) is None:
+                # Fallback for providers without an async client: run the sync call in a thread
+                return await asyncio.to_thread(
+                    provider.chat_completion, messages=full_messages, model=target[1], **kwargs
+                )
+            return await provider.achat_completion(
+                messages=full_messages, model=target[1], **kwargs
+            )
+
+        return await self._route(attempt, provider_name, model)
+
+    async def achat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        provider_name: str = "openrouter",
+        model: Optional[str] = None,
+        **kwargs,
+    ) -> AsyncIterator:
+        """
+        Create a streaming chat completion, as an async iterator.
+
+        A stream only counts as started once its first chunk arrives, so
+        failures before any output are retried and fail over like
+        achat_completion. With hedging enabled, a slow first token triggers a
+        second identical request and the faster stream is kept.
+        """
+
+        async def attempt(target: Target) -> PrefetchedStream:
+            if ResilienceConfig.HEDGE_REQUESTS:
+                return await self._open_hedged_stream(target, messages, **kwargs)
+            return await self._open_stream(target, messages, **kwargs)
+
+        return await self._route(attempt, provider_name, model)
+
+    def _targets(self, provider_name: str, model: Optional[str]) -> List[Target]:
+        """The requested target followed by the fallback chain, skipping unavailable providers."""
+        provider = self._require_provider(provider_name)
+        requested = (provider_name, model or provider.config["default_model"])
+        available = set(self.get_available_providers())
+
+        targets = [requested]
+        for target in self._fallback_chain:
+            if target not in targets and target[0] in available:
+                targets.append(target)
+        return targets
+
+    async def _route(
+        self,
+        attempt: Callable[[Target], Awaitable[Any]],
+        provider_name: str,
+        model: Optional[str],
+    ):
+        """Run attempt over the targets in order until one succeeds."""
+        targets = self._targets(provider_name, model)
+        # Skip targets whose circuit is open, but always try at least one
+        allowed = [t for t in targets if self._breaker.allow(_target_key(t))] or targets[:1]
+
+        last_error: Optional[Exception] = None
+        for target in allowed:
+            try:
+                return await self._with_retries(attempt, target)
+            except Exception as e:
+                # A bad request would fail the same way on every fallback
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                print(f"Provider {_target_key(target)} failed: {e}")
+        raise last_error
+
+    async def _with_retries(self, attempt: Callable[[Target], Awaitable[Any]], target: Target):
+        """Call attempt(target), retrying transient errors with jittered backoff."""
+        key = _target_key(target)
+        for retry in range(ResilienceConfig.MAX_RETRIES + 1):
+            try:
+                result = await attempt(target)
+            except Exception as e:
+                # Only upstream trouble counts against the target, not bad requests
+                if not is_retryable(e):
+                    raise
+                self._breaker.record_failure(key)
+                if retry == ResilienceConfig.MAX_RETRIES or self._breaker.is_open(key):
+                    raise
+                delay = backoff_delay(
+                    retry, ResilienceConfig.BACKOFF_BASE_MS, ResilienceConfig.BACKOFF_MAX_MS
+                )
+                print(f"Retrying {key} in {delay:.2f}s after: {e}")
+                await asyncio.sleep(delay)
+            else:
+                self._breaker.record_success(key)
+                return result
+
+    async def _open_stream(
+        self, target: Target, messages: List[Dict[str, str]], **kwargs
+    ) -> PrefetchedStream:
+        """Start a stream on one target and wait for its first chunk."""
+        provider = self._require_provider(target[0])
+        full_messages = await self._aprepare_messages(provider, messages, target[1])
+        started = time.monotonic()
+
+        if getattr(provider, "async_client", None) is None:
+            # Fallback for providers without an async client: pull sync chunks in a thread
+            sync_stream = await asyncio.to_thread(
+                provider.chat_completion_stream,
+                messages=full_messages,
+                model=target[1],
+                **kwargs,
             )
+            stream = _iterate_in_thread(sync_stream)
+        else:
+            stream = await provider.achat_completion_stream(
+                messages=full_messages, model=target[1], **kwargs
+            )
+
+        iterator = stream.__aiter__()
+        try:
+            first_chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            raise EmptyStreamError(f"{_target_key(target)} returned an empty stream")
+        except BaseException:
+            # Includes cancellation of a hedging loser: release the connection
+            await close_stream(stream)
+            raise
 
-        return provider.chat_completion_stream(
-            messages=full_messages, model=model, **kwargs
+        self._latency.record(_target_key(target), time.monotonic() - started)
+        return PrefetchedStream(
+            first_chunk, iterator, stream, target, payload_size(full_messages)
         )
 
+    async def _open_hedged_stream(
+        self, target: Target, messages: List[Dict[str, str]], **kwargs
+    ) -> PrefetchedStream:
+        """Open a stream, racing a second request if the first token is slow to arrive."""
+        key = _target_key(target)
+        delay = self._latency.percentile(key, ResilienceConfig.HEDGE_PERCENTILE)
+        if delay is None:
+            delay = ResilienceConfig.HEDGE_DEFAULT_DELAY_MS / 1000
+
+        primary = asyncio.create_task(self._open_stream(target, messages, **kwargs))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except BaseException:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        print(f"Hedging {key}: no first token after {delay:.2f}s")
+        backup = asyncio.create_task(self._open_stream(target, messages, **kwargs))
+        return await first_success([primary, backup])
+
     def is_provider_available(self, provider_name: str) -> bool:
         """Check if a provider is available."""
         provider = self.get_provider(provider_name)
         return provider.is_connected() if provider else False
 
 
+async def _iterate_in_thread(stream) -> AsyncIterator:
+    """Adapt a blocking chunk iterator into an async one without blocking the loop."""
+    iterator = iter(stream)
+    sentinel = object()
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, sentinel)
+        if chunk is sentinel:
+            break
+        yield chunk
+
+
+def _target_key(target: Target) -> str:
+    return f"{target[0]}:{target[1]}"
+
+
 # Global provider manager instance
 provider_manager = ProviderManager()
@@ -6,6 +6,7 @@ import os
 from typing import List
 from ark.models.provider import ProviderConfig
 from .base import BaseProvider
+from .catalog import model_catalog
 
 
 class OpenRouterProvider(BaseProvider):
@@ -13,21 +14,15 @@ class OpenRouterProvider(BaseProvider):
 
     def __init__(self):
         config: ProviderConfig = {
-            "base_url": "https://openrouter.ai/api/v1",
+            "base_url": os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
             "api_key": os.environ.get("OPENROUTER_API_KEY", ""),
             "default_model": "google/gemini-2.0-flash-001",
         }
         super().__init__(config)
 
     def get_available_models(self) -> List[str]:
-        """Get available OpenRouter models."""
-        # For OpenRouter, we can define common models or fetch from API
-        return [
-            "google/gemini-2.0-flash-001",
-            "perplexity/sonar",
-            "anthropic/claude-3.5-sonnet",
-            "openai/gpt-4",
-        ]
+        """Get available OpenRouter chat models from the catalog."""
+        return [info["id"] for info in model_catalog.chat_models()]
 
     def is_connected(self) -> bool:
         """Check if OpenRouter is available."""
@@ -35,5 +30,8 @@ class OpenRouterProvider(BaseProvider):
 
     def supports_tools(self, model: str) -> bool:
         """Check if a model supports tool calling."""
-        # Perplexity models don't support tools
+        supported = model_catalog.supports_tools(model)
+        if supported is not None:
+            return supported
+        # Not in the catalog yet: Perplexity models don't support tools
         return not ("perplexity" in model.lower() or "sonar" in model.lower())
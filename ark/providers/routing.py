@@ -0,0 +1,187 @@
+"""
+Building blocks for resilient provider routing: retries, circuit breaking,
+latency tracking and pre-fetched streams.
+"""
+import time
+import random
+import asyncio
+import inspect
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import openai
+
+# HTTP statuses worth retrying on the same target
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an upstream error is transient and the request can be retried."""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, EmptyStreamError)
+
+
+def backoff_delay(attempt: int, base_ms: int, max_ms: int) -> float:
+    """Full-jitter exponential backoff, in seconds, before retry number attempt (0-based)."""
+    return random.uniform(0, min(max_ms, base_ms * (2 ** attempt))) / 1000
+
+
+def parse_fallback_chain(value: str) -> List[Tuple[str, str]]:
+    """
+    Parse "provider:model,provider:model" into (provider, model) pairs.
+
+    Only the first colon separates the provider, so model variants such as
+    "deepseek/deepseek-r1:free" are kept intact.
+    """
+    chain = []
+    for entry in value.split(","):
+        provider, _, model = entry.strip().partition(":")
+        if provider and model:
+            chain.append((provider, model))
+    return chain
+
+
+class EmptyStreamError(Exception):
+    """A stream ended before producing its first chunk."""
+
+
+class CircuitBreaker:
+    """
+    Per-target circuit breaker.
+
+    After failure_threshold consecutive failures a target is skipped for
+    reset_seconds; then a single trial request is let through and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+
+    def allow(self, key: str) -> bool:
+        """Whether a request to the target may be attempted now."""
+        opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return True
+        if time.monotonic() - opened_at >= self.reset_seconds:
+            # Half-open: allow one trial, re-arm the timer for everyone else
+            self._opened_at[key] = time.monotonic()
+            return True
+        return False
+
+    def record_success(self, key: str):
+        self._failures.pop(key, None)
+        self._opened_at.pop(key, None)
+
+    def record_failure(self, key: str):
+        failures = self._failures.get(key, 0) + 1
+        self._failures[key] = failures
+        if failures >= self.failure_threshold:
+            self._opened_at[key] = time.monotonic()
+
+    def is_open(self, key: str) -> bool:
+        return key in self._opened_at
+
+
+class LatencyTracker:
+    """Rolling time-to-first-token samples per target."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """The q-th quantile (0-1) of recent samples, or None until there are enough."""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class PrefetchedStream:
+    """
+    A chunk stream whose first chunk has already been received.
+
+    Iterating replays that chunk, then continues with the live stream.
+    request_bytes is the size of the messages sent to open it.
+    """
+
+    def __init__(
+        self,
+        first_chunk: Any,
+        iterator: AsyncIterator,
+        stream: Any,
+        target: Tuple[str, str],
+        request_bytes: int = 0,
+    ):
+        self.first_chunk = first_chunk
+        self.target = target
+        self.request_bytes = request_bytes
+        self._iterator = iterator
+        self._stream = stream
+
+    def __aiter__(self) -> AsyncIterator:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator:
+        yield self.first_chunk
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def aclose(self):
+        """Close the underlying HTTP stream (used for hedging losers)."""
+        await close_stream(self._stream)
+
+
+async def close_stream(stream: Any):
+    """Close an OpenAI stream or async generator, ignoring errors."""
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        pass
+
+
+async def first_success(tasks: List[asyncio.Task]) -> PrefetchedStream:
+    """
+    Wait for the first task to produce a stream, then cancel the others.
+
+    Raises the last error if every task fails.
+    """
+    pending = set(tasks)
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = None
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    # Finished in the same tick as the winner; not needed
+                    await task.result().aclose()
+            if winner is not None:
+                return winner
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,3 @@
+"""
+Provider tests.
+"""
\ No newline at end of file
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for provider retries, fallback and hedging against a local
+stand-in OpenAI-compatible server.
+
+Run from the repository root: python -m ark.providers.tests.test_failover
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Behaviour of the stand-in server, by requested model:
+#   flaky/model   - first request fails with 503, later ones stream
+#   broken/model  - always fails with 500
+#   slow/model    - first request waits 2s before its first token
+#   invalid/model - always fails with 400
+#   anything else - streams "Hello from <model>"
+request_counts = {}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        count = request_counts[model] = request_counts.get(model, 0) + 1
+
+        if model in ("broken/model", "invalid/model") or (model == "flaky/model" and count == 1):
+            self.send_response({"broken/model": 500, "invalid/model": 400}.get(model, 503))
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps({"error": {"message": "upstream down"}}).encode())
+            return
+
+        if model == "slow/model" and count == 1:
+            time.sleep(2)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for text, finish_reason in ((f"Hello from {model}", None), ("", "stop")):
+            chunk = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": {"content": text}, "finish_reason": finish_reason}
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def collect(stream) -> str:
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+    return "".join(parts)
+
+
+async def test_failover(port: int):
+    """Test retries, fallback and hedging"""
+    from ark.config import ResilienceConfig
+    from ark.providers.manager import ProviderManager
+
+    print("🧪 Testing provider failover...")
+    manager = ProviderManager()
+    messages = [{"role": "user", "content": "Hi"}]
+
+    try:
+        # 1. Retry a transient error on the same model
+        print("\n1. Testing retry...")
+        stream = await manager.achat_completion_stream(messages, model="flaky/model")
+        text = await collect(stream)
+        print(f"✅ Retried: {text!r} after {request_counts['flaky/model']} requests")
+
+        # 2. Fall back to the next model in the chain
+        print("\n2. Testing fallback chain...")
+        stream = await manager.achat_completion_stream(messages, model="broken/model")
+        text = await collect(stream)
+        print(f"✅ Fell back: {text!r}")
+
+        # 3. Open the circuit after repeated failures
+        print("\n3. Testing circuit breaker...")
+        for _ in range(ResilienceConfig.BREAKER_FAILURE_THRESHOLD):
+            await collect(await manager.achat_completion_stream(messages, model="broken/model"))
+        before = request_counts["broken/model"]
+        await collect(await manager.achat_completion_stream(messages, model="broken/model"))
+        print(f"✅ Broken model skipped while open: {request_counts['broken/model'] == before}")
+
+        # 4. Don't retry or fall back on a bad request
+        print("\n4. Testing non-retryable error...")
+        good_before = request_counts.get("good/model", 0)
+        try:
+            await manager.achat_completion_stream(messages, model="invalid/model")
+            print("❌ Bad request succeeded")
+        except Exception as e:
+            print(
+                f"✅ Raised {type(e).__name__} after {request_counts['invalid/model']} request(s), "
+                f"fallback untouched: {request_counts.get('good/model', 0) == good_before}"
+            )
+
+        # 5. Hedge a slow first token
+        print("\n5. Testing hedged request...")
+        ResilienceConfig.HEDGE_REQUESTS = True
+        ResilienceConfig.HEDGE_DEFAULT_DELAY_MS = 200
+        started = time.monotonic()
+        text = await collect(await manager.achat_completion_stream(messages, model="slow/model"))
+        elapsed = time.monotonic() - started
+        print(f"✅ Hedged: {text!r} in {elapsed:.2f}s (slow request alone takes 2s)")
+
+        print("\n🎉 All tests completed!")
+
+    except Exception as e:
+        print(f"❌ Test failed with error: {e}")
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    # Point the provider at the stand-in before it is created
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OPENROUTER_API_KEY"] = "test"
+    os.environ["PROVIDER_FALLBACK_CHAIN"] = "openrouter:good/model"
+
+    asyncio.run(test_failover(port))
+    server.shutdown()
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from ark.utils.encoding import decode_data_url
+
+logger = logging.getLogger(__name__)
+
+# Key extensions for attachments that arrive without a file name
+EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+
+def is_reference(part: Dict[str, Any]) -> bool:
+    """Whether a content part points at an R2 object instead of carrying its data"""
+    if part.get("type") == "file":
+        return "file_key" in (part.get("file") or {})
+    if part.get("type") == "image_url":
+        return "file_key" in (part.get("image_url") or {})
+    return False
+
+
+def has_attachments(content) -> bool:
+    """Whether message content has file/image parts that aren't references yet"""
+    return isinstance(content, list) and any(
+        part.get("type") in ("file", "image_url") and not is_reference(part)
+        for part in content
+    )
+
+
+async def externalize_content(
+    content: List[Dict[str, Any]], user_id: str, known_files: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Replace attachment data in message content with R2 references
+
+    Inline data URLs are matched to the message's already uploaded files by
+    content hash and uploaded under their content-addressed key otherwise;
+    presigned image URLs of uploaded files are swapped for the file they
+    point to. Parts that can't be resolved are kept as they are.
+
+    Args:
+        content: Message content parts
+        user_id: Owner of any new uploads
+        known_files: The message's FileReferences
+
+    Returns:
+        (new content, upload metadata of files uploaded here)
+    """
+    from ark.services.r2_storage import aupload_file
+
+    uploaded_files = [f for f in known_files if f.get("file_key")]
+    by_hash = {f["content_hash"]: f for f in uploaded_files if f.get("content_hash")}
+    by_url = {f["presigned_url"]: f for f in uploaded_files if f.get("presigned_url")}
+    uploaded: List[Dict[str, Any]] = []
+
+    async def externalize(part: Dict[str, Any]) -> Dict[str, Any]:
+        if part.get("type") == "file" and not is_reference(part):
+            filename = part.get("file", {}).get("filename") or "document.pdf"
+            url = part.get("file", {}).get("file_data") or ""
+        elif part.get("type") == "image_url" and not is_reference(part):
+            filename = None
+            url = part.get("image_url", {}).get("url") or ""
+        else:
+            return part
+
+        file_ref = by_url.get(url)
+        if file_ref is None:
+            decoded = await asyncio.to_thread(_decode_and_hash, url)
+            if decoded is None:
+                # An external URL, nothing stored inline
+                return part
+            mime_type, data, content_hash = decoded
+            file_ref = by_hash.get(content_hash)
+            if file_ref is None:
+                name = filename or f"image{EXTENSIONS.get(mime_type, '')}"
+                file_ref = await aupload_file(name, data, mime_type, user_id)
+                if file_ref is None:
+                    logger.error(f"Could not move inline {name} to R2, keeping it inline")
+                    return part
+                by_hash[content_hash] = file_ref
+                uploaded.append(file_ref)
+        return _reference_part(part["type"], file_ref, filename)
+
+    new_content = await asyncio.gather(*(externalize(part) for part in content))
+    return list(new_content), uploaded
+
+
+def _decode_and_hash(url: str) -> Optional[Tuple[str, bytes, str]]:
+    decoded = decode_data_url(url)
+    if decoded is None:
+        return None
+    mime_type, data = decoded
+    return mime_type, data, hashlib.sha256(data).hexdigest()
+
+
+def _reference_part(
+    part_type: str, file_ref: Dict[str, Any], filename: Optional[str]
+) -> Dict[str, Any]:
+    reference = {
+        "file_key": file_ref["file_key"],
+        "content_hash": file_ref.get("content_hash"),
+        "content_type": file_ref.get("content_type"),
+        "file_size": file_ref.get("file_size") or file_ref.get("size"),
+    }
+    if part_type == "file":
+        filename = filename or file_ref.get("original_filename") or "document.pdf"
+        return {"type": "file", "file": {"filename": filename, **reference}}
+    return {"type": "image_url", "image_url": reference}
+
+
+async def rehydrate_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Resolve R2 references in provider-bound messages
+
+    PDFs become base64 data URLs (through the PDF cache), images become
+    presigned URLs. Messages without references are returned unchanged.
+    """
+    if not any(_has_references(message.get("content")) for message in messages):
+        return messages
+    return list(await asyncio.gather(*(_rehydrate_message(m) for m in messages)))
+
+
+def _has_references(content) -> bool:
+    return isinstance(content, list) and any(is_reference(part) for part in content)
+
+
+async def _rehydrate_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    content = message.get("content")
+    if not _has_references(content):
+        return message
+    parts = await asyncio.gather(*(_rehydrate_part(part) for part in content))
+    return {**message, "content": list(parts)}
+
+
+async def _rehydrate_part(part: Dict[str, Any]) -> Dict[str, Any]:
+    if not is_reference(part):
+        return part
+
+    from ark.services.pdf_cache import pdf_cache
+    from ark.services.r2_storage import adownload_to_file, agenerate_presigned_url
+
+    if part["type"] == "image_url":
+        url = await agenerate_presigned_url(part["image_url"]["file_key"])
+        if url:
+            return {"type": "image_url", "image_url": {"url": url}}
+        return {"type": "text", "text": "[Image unavailable]"}
+
+    file = part["file"]
+    file_key = file["file_key"]
+    data_url = await pdf_cache.afetch(
+        file.get("content_hash") or file_key,
+        lambda path: adownload_to_file(file_key, path),
+    )
+    if data_url:
+        return {"type": "file", "file": {"filename": file["filename"], "file_data": data_url}}
+    logger.error(f"Could not load {file_key} for the request")
+    return {"type": "text", "text": f"[File unavailable: {file['filename']}]"}
@@ -0,0 +1,289 @@
+"""
+Prometheus metrics for LLM requests, served at /metrics.
+"""
+import hmac
+import time
+import bisect
+from typing import Dict, List, Optional, Sequence, Tuple
+from ark.config import MetricsConfig
+
+# Latency buckets in seconds, from token-level gaps up to long generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Request payload buckets in bytes (1 KB .. 32 MB)
+PAYLOAD_BUCKETS = tuple(1024 * 4 ** i for i in range(9))
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter with labels, in the Prometheus text format."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in the Prometheus text format."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts with a trailing +Inf slot, [sum])
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: LabelValues, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    (*self.label_names, "le"), (*labels, _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{series_labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Set of metrics rendered together for the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str]) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Global registry and the LLM request metrics recorded into it
+registry = MetricsRegistry()
+
+LLM_LABELS = ("provider", "model")
+
+llm_requests = registry.counter(
+    "ark_llm_requests_total",
+    "Chat completion requests by outcome (ok, error, cached)",
+    (*LLM_LABELS, "outcome"),
+)
+llm_time_to_first_token = registry.histogram(
+    "ark_llm_time_to_first_token_seconds",
+    "Time from sending a request to its first streamed token",
+    LLM_LABELS,
+)
+llm_inter_token_latency = registry.histogram(
+    "ark_llm_inter_token_latency_seconds",
+    "Gap between consecutive streamed chunks",
+    LLM_LABELS,
+)
+llm_request_duration = registry.histogram(
+    "ark_llm_request_duration_seconds",
+    "Total time to generate a response",
+    LLM_LABELS,
+)
+llm_prompt_tokens = registry.counter(
+    "ark_llm_prompt_tokens_total", "Prompt tokens reported by the provider", LLM_LABELS
+)
+llm_completion_tokens = registry.counter(
+    "ark_llm_completion_tokens_total", "Completion tokens reported by the provider", LLM_LABELS
+)
+llm_request_bytes = registry.histogram(
+    "ark_llm_request_bytes",
+    "Size of the serialized request messages",
+    LLM_LABELS,
+    PAYLOAD_BUCKETS,
+)
+
+
+class GenerationMetrics:
+    """
+    Timings and token counts of one streamed generation.
+
+    Call token() for every chunk carrying content, then finish() once the
+    stream ends to record everything under the provider/model that served it.
+    """
+
+    def __init__(self, provider: str, model: Optional[str], request_bytes: int = 0):
+        self.provider = provider
+        self.model = model or ""
+        self.request_bytes = request_bytes
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self._gaps: List[float] = []
+
+    def token(self):
+        now = time.monotonic()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        else:
+            self._gaps.append(now - self.last_token_at)
+        self.last_token_at = now
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    def finish(self, usage=None, served_by: Optional[Tuple[str, str]] = None, outcome: str = "ok"):
+        """
+        Record the generation
+
+        Args:
+            usage: The provider's usage object, if it sent one
+            served_by: (provider, model) that actually answered, e.g. a fallback
+            outcome: "ok", "error" or "cached"
+        """
+        self.duration = time.monotonic() - self.started
+        if served_by:
+            self.provider, self.model = served_by
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+            self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+        labels = (self.provider, self.model)
+        try:
+            llm_requests.inc((*labels, outcome))
+            if outcome == "cached":
+                return
+            llm_request_duration.observe(labels, self.duration)
+            if self.request_bytes:
+                llm_request_bytes.observe(labels, self.request_bytes)
+            if self.time_to_first_token is not None:
+                llm_time_to_first_token.observe(labels, self.time_to_first_token)
+            for gap in self._gaps:
+                llm_inter_token_latency.observe(labels, gap)
+            if self.prompt_tokens:
+                llm_prompt_tokens.inc(labels, self.prompt_tokens)
+            if self.completion_tokens:
+                llm_completion_tokens.inc(labels, self.completion_tokens)
+        except Exception as e:
+            print(f"Error recording generation metrics: {e}")
+
+    def message_fields(self) -> Dict[str, object]:
+        """Per-message fields persisted with the assistant message"""
+        fields = {
+            "provider": self.provider,
+            "model": self.model,
+            "request_bytes": self.request_bytes,
+        }
+        if self.time_to_first_token is not None:
+            fields["time_to_first_token"] = round(self.time_to_first_token, 3)
+        if self.prompt_tokens is not None:
+            fields["prompt_tokens"] = self.prompt_tokens
+        return fields
+
+
+def payload_size(messages) -> int:
+    """
+    Size in bytes of the strings in provider-bound messages
+
+    Walks the messages instead of serializing them; base64 attachments,
+    which dominate large requests, are counted without being copied.
+    """
+    if isinstance(messages, str):
+        return len(messages) if messages.isascii() else len(messages.encode("utf-8"))
+    if isinstance(messages, dict):
+        return sum(payload_size(value) for value in messages.values())
+    if isinstance(messages, (list, tuple)):
+        return sum(payload_size(value) for value in messages)
+    return 0
+
+
+async def metrics_endpoint(request):
+    """
+    Starlette handler serving the registry for Prometheus scrapes
+
+    The backend is public behind Caddy, so scrapes must send
+    "Authorization: Bearer <METRICS_TOKEN>"; without a token configured the
+    endpoint doesn't exist.
+    """
+    from starlette.responses import PlainTextResponse
+
+    if not MetricsConfig.TOKEN:
+        return PlainTextResponse("Not Found", status_code=404)
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token, MetricsConfig.TOKEN):
+        return PlainTextResponse(
+            "Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,247 @@
+import os
+import asyncio
+import hashlib
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from ark.config import PdfCacheConfig
+from ark.utils.encoding import encode_file_to_data_url
+
+logger = logging.getLogger(__name__)
+
+# Chunk size used when copying uploads into the cache
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class PdfCache:
+    """
+    Bounded two-level cache of PDF payloads for model requests.
+
+    Raw bytes live on disk (LRU, capped at max_disk_bytes) so repeat turns
+    about the same PDF don't download it again; the base64 data URLs built
+    from them are kept in memory (LRU, capped at max_memory_bytes) so they
+    aren't re-encoded either. Keys are content hashes (or R2 file keys for
+    files without one).
+    """
+
+    def __init__(self, cache_dir: str, max_disk_bytes: int, max_memory_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # file name -> size
+        self._disk_bytes = 0
+        self._memory: "OrderedDict[str, str]" = OrderedDict()  # key -> data URL
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the disk LRU from files left by a previous run, oldest first"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entries = sorted(
+                (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".pdf")),
+                key=lambda entry: entry.stat().st_mtime,
+            )
+            for entry in entries:
+                size = entry.stat().st_size
+                self._disk[entry.name] = size
+                self._disk_bytes += size
+            self._evict_disk()
+        except OSError as e:
+            logger.error(f"Could not load PDF cache index from {self.cache_dir}: {e}")
+
+    @staticmethod
+    def _file_name(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pdf"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached data URL for key, encoding from disk if needed"""
+        file_name = self._file_name(key)
+        with self._lock:
+            data_url = self._memory.get(key)
+            if data_url is not None:
+                self._memory.move_to_end(key)
+                if file_name in self._disk:
+                    self._disk.move_to_end(file_name)
+                self.hits += 1
+                return data_url
+
+            if file_name not in self._disk:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(file_name)
+
+        try:
+            data_url = encode_file_to_data_url(self.cache_dir / file_name, "application/pdf")
+        except OSError as e:
+            logger.error(f"Could not read cached PDF {file_name}: {e}")
+            self._forget(file_name)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, data_url)
+        return data_url
+
+    def path(self, key: str) -> Optional[Path]:
+        """Path of the cached PDF for key, or None if it isn't on disk"""
+        file_name = self._file_name(key)
+        with self._lock:
+            if file_name not in self._disk:
+                return None
+        return self.cache_dir / file_name
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async version of get; disk reads and encoding run off the event loop"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def astore_stream(self, key: str, file_obj) -> bool:
+        """
+        Copy an upload into the cache chunk by chunk
+
+        A PDF larger than max_disk_bytes is not cached at all: it would only
+        evict everything else and then itself. The copy stops as soon as it
+        passes the cap.
+
+        Args:
+            key: Cache key (content hash or file key)
+            file_obj: Source with async read(size) and seek(offset), e.g. rx.UploadFile
+
+        Returns:
+            True if the file was cached
+        """
+        temp_path = self._temp_path(key)
+        try:
+            await file_obj.seek(0)
+            written = 0
+            f = await asyncio.to_thread(open, temp_path, "wb")
+            try:
+                while chunk := await file_obj.read(COPY_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > self.max_disk_bytes:
+                        break
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+            if written > self.max_disk_bytes:
+                logger.info(f"Not caching PDF {key}: larger than the {self.max_disk_bytes} byte cache")
+                self._discard(temp_path)
+                return False
+            await asyncio.to_thread(self._commit, key, temp_path)
+            return True
+        except Exception as e:
+            logger.error(f"Could not cache PDF {key}: {e}")
+            self._discard(temp_path)
+            return False
+
+    async def afetch(
+        self, key: str, download: Callable[[Path], Awaitable[bool]]
+    ) -> Optional[str]:
+        """
+        Return the data URL for key, downloading the PDF on a miss
+
+        A download larger than max_disk_bytes is encoded straight from the
+        temp file and not cached.
+
+        Args:
+            key: Cache key (content hash or file key)
+            download: Async callable that writes the PDF to the given path and
+                returns True on success
+
+        Returns:
+            Base64 data URL or None if the download failed
+        """
+        data_url = await self.aget(key)
+        if data_url is not None:
+            return data_url
+
+        temp_path = self._temp_path(key)
+        try:
+            if not await download(temp_path):
+                self._discard(temp_path)
+                return None
+            if temp_path.stat().st_size > self.max_disk_bytes:
+                data_url = await asyncio.to_thread(
+                    encode_file_to_data_url, temp_path, "application/pdf"
+                )
+                self._discard(temp_path)
+                return data_url
+            await asyncio.to_thread(self._commit, key, temp_path)
+        except Exception as e:
+            logger.error(f"Could not fetch PDF {key} into cache: {e}")
+            self._discard(temp_path)
+            return None
+        return await self.aget(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_bytes": self._disk_bytes,
+                "memory_bytes": self._memory_bytes,
+            }
+
+    def _temp_path(self, key: str) -> Path:
+        # Unique per call: concurrent stores of the same PDF run on one event
+        # loop thread and must not write to the same file
+        return self.cache_dir / f"{self._file_name(key)}.{uuid.uuid4().hex}.part"
+
+    def _commit(self, key: str, temp_path: Path):
+        """Move a fully written temp file into the cache and enforce the size cap"""
+        file_name = self._file_name(key)
+        size = temp_path.stat().st_size
+        os.replace(temp_path, self.cache_dir / file_name)
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(file_name, 0)
+            self._disk[file_name] = size
+            self._evict_disk()
+
+    def _remember(self, key: str, data_url: str):
+        """Add a data URL to the memory LRU (caller holds the lock)"""
+        if len(data_url) > self.max_memory_bytes:
+            return
+        self._memory_bytes += len(data_url) - len(self._memory.pop(key, ""))
+        self._memory[key] = data_url
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """Delete least recently used files until under the cap (caller holds the lock)"""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            file_name, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._discard(self.cache_dir / file_name)
+
+    def _forget(self, file_name: str):
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(file_name, 0)
+
+    @staticmethod
+    def _discard(path: Path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Could not remove cached PDF {path}: {e}")
+
+
+# Global instance
+pdf_cache = PdfCache(
+    PdfCacheConfig.CACHE_DIR,
+    PdfCacheConfig.MAX_DISK_BYTES,
+    PdfCacheConfig.MAX_MEMORY_BYTES,
+)
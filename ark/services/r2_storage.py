@@ -1,18 +1,87 @@
 import os
-import uuid
 import boto3
+import hashlib
+import asyncio
+import time
 import logging
-import base64
-import requests
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
+from ark.config import R2Config
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# S3/R2 reject multipart parts smaller than this (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class PresignedUrlCache:
+    """
+    Thread-safe LRU of presigned URLs keyed by (file_key, expiration).
+
+    A cached URL is served while at least min_remaining of its lifetime is
+    left; after that the caller signs a fresh one, well before the old URL
+    actually expires.
+    """
+
+    def __init__(self, max_entries: int, min_remaining: float):
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple[str, int], tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_key: str, expiration: int) -> Optional[str]:
+        """Return a cached URL with comfortable remaining lifetime, or None"""
+        cache_key = (file_key, expiration)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry:
+                url, expires_at = entry
+                if expires_at - time.time() >= expiration * self.min_remaining:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return url
+                del self._entries[cache_key]
+            self.misses += 1
+            return None
+
+    def put(self, file_key: str, expiration: int, url: str, signed_at: float):
+        """Cache a URL signed at signed_at, evicting the least recently used"""
+        cache_key = (file_key, expiration)
+        with self._lock:
+            self._entries[cache_key] = (url, signed_at + expiration)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, file_keys: list[str]):
+        """Drop cached URLs for deleted objects, whatever their expiration"""
+        deleted = set(file_keys)
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] in deleted]:
+                del self._entries[cache_key]
+
+    def invalidate_prefix(self, prefix: str):
+        """Drop cached URLs for every object under a key prefix"""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0].startswith(prefix)]:
+                del self._entries[cache_key]
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
 
 class R2StorageService:
     def __init__(self):
@@ -28,22 +97,50 @@ class R2StorageService:
                 "Missing R2 configuration. Please set R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_BUCKET_NAME, and R2_ENDPOINT_URL"
             )
 
+        # One client (thread-safe) shared by all workers, with a keep-alive pool
+        # sized for concurrent uploads
         self.client = boto3.client(
             "s3",
             endpoint_url=self.endpoint_url,
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
             region_name="auto",
+            config=Config(
+                max_pool_connections=R2Config.MAX_POOL_CONNECTIONS,
+                connect_timeout=R2Config.CONNECT_TIMEOUT,
+                read_timeout=R2Config.READ_TIMEOUT,
+                retries={"max_attempts": 3, "mode": "standard"},
+                tcp_keepalive=True,
+            ),
+        )
+
+        # Bounded pool the async API offloads blocking boto3 calls to
+        self._executor = ThreadPoolExecutor(
+            max_workers=R2Config.MAX_WORKERS, thread_name_prefix="r2"
+        )
+
+        self.url_cache = PresignedUrlCache(
+            R2Config.PRESIGNED_URL_CACHE_SIZE, R2Config.PRESIGNED_URL_MIN_REMAINING
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking method on the R2 executor without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
         )
 
     def upload_file(
         self, file_path: str, file_content: bytes, content_type: str, user_id: str
     ) -> Optional[Dict[str, Any]]:
         """
-        Upload a file to R2 storage
+        Upload a file to R2 storage under its content-addressed key
+
+        If the user already has an object with the same content, the upload is
+        skipped and the existing key is returned.
 
         Args:
-            file_path: Local file path (for generating key)
+            file_path: Local file path (for the key's extension)
             file_content: File content as bytes
             content_type: MIME type of the file
             user_id: User ID for organizing files
@@ -52,35 +149,24 @@ class R2StorageService:
             Dict with file metadata or None if upload failed
         """
         try:
-            # Generate unique file key
-            file_extension = os.path.splitext(file_path)[1]
-            file_id = str(uuid.uuid4())
-            file_key = f"uploads/{user_id}/{file_id}{file_extension}"
-
-            # Upload to R2
-            self.client.put_object(
-                Bucket=self.bucket_name,
-                Key=file_key,
-                Body=file_content,
-                ContentType=content_type,
-                Metadata={
-                    "uploaded_at": datetime.utcnow().isoformat(),
-                    "user_id": user_id,
-                    "original_filename": os.path.basename(file_path),
-                },
+            content_hash = hashlib.sha256(file_content).hexdigest()
+            file_key = self._content_file_key(user_id, content_hash, file_path)
+
+            deduplicated = self._object_exists(file_key)
+            if not deduplicated:
+                self.client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Body=file_content,
+                    ContentType=content_type,
+                    Metadata=self._object_metadata(file_path, user_id),
+                )
+                logger.info(f"Successfully uploaded file {file_key} to R2")
+
+            return self._upload_result(
+                file_key, content_hash, file_path, content_type, len(file_content), deduplicated
             )
 
-            logger.info(f"Successfully uploaded file {file_key} to R2")
-
-            return {
-                "file_id": file_id,
-                "file_key": file_key,
-                "original_filename": os.path.basename(file_path),
-                "content_type": content_type,
-                "size": len(file_content),
-                "uploaded_at": datetime.utcnow(),
-            }
-
         except ClientError as e:
             logger.error(f"Failed to upload file to R2: {e}")
             return None
@@ -88,6 +174,56 @@ class R2StorageService:
             logger.error(f"Unexpected error uploading file: {e}")
             return None
 
+    @staticmethod
+    def _content_file_key(user_id: str, content_hash: str, file_path: str) -> str:
+        """
+        Object key derived from the file's SHA-256, scoped to the user so
+        adelete_user_files can still find everything under the user's prefix
+        """
+        file_extension = os.path.splitext(file_path)[1].lower()
+        return f"uploads/{user_id}/sha256/{content_hash}{file_extension}"
+
+    @staticmethod
+    def _object_metadata(file_path: str, user_id: str) -> Dict[str, str]:
+        """Custom metadata stored alongside each uploaded object"""
+        return {
+            "uploaded_at": datetime.utcnow().isoformat(),
+            "user_id": user_id,
+            "original_filename": os.path.basename(file_path),
+        }
+
+    @staticmethod
+    def _upload_result(
+        file_key: str,
+        content_hash: str,
+        file_path: str,
+        content_type: str,
+        size: int,
+        deduplicated: bool,
+    ) -> Dict[str, Any]:
+        """File metadata returned by the upload methods"""
+        if deduplicated:
+            logger.info(f"Skipped upload of {file_key}, content already in R2")
+        return {
+            "file_key": file_key,
+            "content_hash": content_hash,
+            "original_filename": os.path.basename(file_path),
+            "content_type": content_type,
+            "size": size,
+            "uploaded_at": datetime.utcnow(),
+            "deduplicated": deduplicated,
+        }
+
+    def _object_exists(self, file_key: str) -> bool:
+        """Check whether an object is already stored under file_key"""
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=file_key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
     def delete_file(self, file_key: str) -> bool:
         """
         Delete a file from R2 storage
@@ -100,6 +236,7 @@ class R2StorageService:
         """
         try:
             self.client.delete_object(Bucket=self.bucket_name, Key=file_key)
+            self.url_cache.invalidate([file_key])
             logger.info(f"Successfully deleted file {file_key} from R2")
             return True
 
@@ -116,6 +253,9 @@ class R2StorageService:
         """
         Generate a presigned URL for file access
 
+        URLs are served from the cache while they have comfortable remaining
+        lifetime, so repeated loads of a chat see the same URL.
+
         Args:
             file_key: The R2 object key
             expiration: URL expiration time in seconds (default: 24 hours)
@@ -123,12 +263,18 @@ class R2StorageService:
         Returns:
             Presigned URL or None if generation failed
         """
+        cached_url = self.url_cache.get(file_key, expiration)
+        if cached_url:
+            return cached_url
+
         try:
+            signed_at = time.time()
             url = self.client.generate_presigned_url(
                 "get_object",
                 Params={"Bucket": self.bucket_name, "Key": file_key},
                 ExpiresIn=expiration,
             )
+            self.url_cache.put(file_key, expiration, url, signed_at)
             return url
 
         except ClientError as e:
@@ -138,103 +284,333 @@ class R2StorageService:
             logger.error(f"Unexpected error generating presigned URL: {e}")
             return None
 
-    def delete_user_files(self, user_id: str) -> bool:
+    def _list_user_keys(self, user_id: str) -> list[str]:
+        """All object keys under the user's upload prefix"""
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"uploads/{user_id}/"):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return keys
+
+    def _delete_objects(self, file_keys: list[str]):
+        """Batch delete objects, at most 1000 keys per request"""
+        for start in range(0, len(file_keys), 1000):
+            batch = file_keys[start:start + 1000]
+            self.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in batch]},
+            )
+        self.url_cache.invalidate(file_keys)
+
+    def download_to_file(self, file_key: str, dest_path) -> bool:
         """
-        Delete all files for a specific user
+        Download an object to a local file, streaming it rather than buffering
 
         Args:
-            user_id: User ID
+            file_key: The R2 object key
+            dest_path: Local path to write to
 
         Returns:
             True if successful, False otherwise
         """
         try:
-            # List all objects with user prefix
-            response = self.client.list_objects_v2(
-                Bucket=self.bucket_name, Prefix=f"uploads/{user_id}/"
-            )
+            self.client.download_file(self.bucket_name, file_key, str(dest_path))
+            logger.info(f"Successfully downloaded file {file_key} from R2")
+            return True
 
-            if "Contents" not in response:
-                return True  # No files to delete
+        except ClientError as e:
+            logger.error(f"Failed to download file {file_key} from R2: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error downloading file {file_key}: {e}")
+            return False
 
-            # Batch delete objects
-            objects_to_delete = [{"Key": obj["Key"]} for obj in response["Contents"]]
+    # Async API: same operations, run on the bounded R2 executor
 
-            self.client.delete_objects(
-                Bucket=self.bucket_name, Delete={"Objects": objects_to_delete}
+    async def aupload_file(
+        self, file_path: str, file_content: bytes, content_type: str, user_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Async version of upload_file"""
+        return await self._run(
+            self.upload_file, file_path, file_content, content_type, user_id
+        )
+
+    async def aupload_stream(
+        self,
+        file_obj,
+        file_path: str,
+        content_type: str,
+        user_id: str,
+        part_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Stream a file to R2 without reading it fully into memory
+
+        A first pass hashes the file chunk by chunk to get its content-addressed
+        key; if that object already exists nothing is uploaded. Otherwise the
+        file is read again one part at a time. A file that fits in a single part
+        is sent with put_object; anything larger becomes a multipart upload with
+        up to `concurrency` parts in flight, so peak memory is bounded by
+        part_size * (concurrency + 1) regardless of file size.
+
+        Args:
+            file_obj: Source with async read(size) and seek(offset), e.g. rx.UploadFile
+            file_path: Original file name (for the key's extension)
+            content_type: MIME type of the file
+            user_id: User ID for organizing files
+            part_size: Bytes per part (default: R2Config.MULTIPART_PART_SIZE)
+            concurrency: Parts uploaded in parallel (default: R2Config.MULTIPART_CONCURRENCY)
+
+        Returns:
+            Dict with file metadata or None if upload failed
+        """
+        part_size = max(part_size or R2Config.MULTIPART_PART_SIZE, MIN_PART_SIZE)
+        concurrency = max(concurrency or R2Config.MULTIPART_CONCURRENCY, 1)
+
+        file_key = None
+        upload_id = None
+        tasks: list[asyncio.Task] = []
+        try:
+            # Hash first: the key must be known before anything is sent
+            digest = hashlib.sha256()
+            total_size = 0
+            while chunk := await file_obj.read(part_size):
+                # hashlib releases the GIL on large buffers, so hash off-loop
+                await self._run(digest.update, chunk)
+                total_size += len(chunk)
+            await file_obj.seek(0)
+
+            content_hash = digest.hexdigest()
+            file_key = self._content_file_key(user_id, content_hash, file_path)
+
+            if await self._run(self._object_exists, file_key):
+                return self._upload_result(
+                    file_key, content_hash, file_path, content_type, total_size, True
+                )
+
+            chunk = await file_obj.read(part_size)
+            if len(chunk) < part_size:
+                # Small file: one request, no multipart bookkeeping
+                await self._run(
+                    self.client.put_object,
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Body=chunk,
+                    ContentType=content_type,
+                    Metadata=self._object_metadata(file_path, user_id),
+                )
+                logger.info(f"Successfully uploaded file {file_key} to R2")
+                return self._upload_result(
+                    file_key, content_hash, file_path, content_type, total_size, False
+                )
+
+            response = await self._run(
+                self.client.create_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=file_key,
+                ContentType=content_type,
+                Metadata=self._object_metadata(file_path, user_id),
+            )
+            upload_id = response["UploadId"]
+            slots = asyncio.Semaphore(concurrency)
+
+            async def send_part(part_number: int, body: bytes) -> Dict[str, Any]:
+                try:
+                    result = await self._run(
+                        self.client.upload_part,
+                        Bucket=self.bucket_name,
+                        Key=file_key,
+                        UploadId=upload_id,
+                        PartNumber=part_number,
+                        Body=body,
+                    )
+                    return {"PartNumber": part_number, "ETag": result["ETag"]}
+                finally:
+                    slots.release()
+
+            part_number = 1
+            while chunk:
+                # Wait for a free slot before reading more, bounding buffered parts
+                await slots.acquire()
+                if any(task.done() and task.exception() for task in tasks):
+                    # A part already failed; stop reading and surface it below
+                    slots.release()
+                    break
+                tasks.append(asyncio.create_task(send_part(part_number, chunk)))
+                part_number += 1
+                chunk = await file_obj.read(part_size)
+
+            parts = await asyncio.gather(*tasks)
+
+            await self._run(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
             )
 
             logger.info(
-                f"Successfully deleted {len(objects_to_delete)} files for user {user_id}"
+                f"Successfully uploaded file {file_key} to R2 in {len(parts)} parts"
+            )
+            return self._upload_result(
+                file_key, content_hash, file_path, content_type, total_size, False
             )
-            return True
 
-        except ClientError as e:
-            logger.error(f"Failed to delete user files: {e}")
-            return False
         except Exception as e:
-            logger.error(f"Unexpected error deleting user files: {e}")
+            logger.error(f"Failed to stream upload {file_key or file_path} to R2: {e}")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if upload_id:
+                try:
+                    await self._run(
+                        self.client.abort_multipart_upload,
+                        Bucket=self.bucket_name,
+                        Key=file_key,
+                        UploadId=upload_id,
+                    )
+                except Exception as abort_e:
+                    logger.error(f"Failed to abort multipart upload {file_key}: {abort_e}")
+            return None
+
+    async def adelete_file(self, file_key: str) -> bool:
+        """Async version of delete_file"""
+        return await self._run(self.delete_file, file_key)
+
+    async def agenerate_presigned_url(
+        self, file_key: str, expiration: int = 86400
+    ) -> Optional[str]:
+        """Async version of generate_presigned_url"""
+        return await self._run(self.generate_presigned_url, file_key, expiration)
+
+    async def adelete_user_files(self, user_id: str) -> bool:
+        """
+        Delete a user's objects that no files row references any more
+
+        Call after the user's rows are gone; objects still referenced (e.g. by
+        an upload saved in the meantime) are kept.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            file_keys = await self._run(self._list_user_keys, user_id)
+        except Exception as e:
+            logger.error(f"Failed to list user files: {e}")
             return False
+        return await self._adelete_unreferenced(file_keys)
 
-    def delete_chat_files(self, file_keys: list[str]) -> bool:
+    async def adelete_chat_files(self, file_keys: list[str]) -> bool:
         """
-        Delete multiple files associated with a chat
+        Delete a deleted chat's objects that no other files row references
+
+        Objects are content-addressed and shared between chats, so each key is
+        only deleted once nothing references it.
 
         Args:
-            file_keys: List of R2 object keys
+            file_keys: The chat's R2 object keys
 
         Returns:
             True if successful, False otherwise
         """
+        return await self._adelete_unreferenced(file_keys)
+
+    async def _adelete_unreferenced(self, file_keys: list[str]) -> bool:
+        """
+        Delete the unreferenced keys among file_keys
+
+        The reference check runs under the keys' advisory locks, which are
+        released before the slow R2 deletes. A files row saved in that window
+        restores its object itself (arestore_missing) if the delete got there
+        first; otherwise the recheck after the delete finds the row and
+        restores the object here.
+        """
         if not file_keys:
             return True
 
-        try:
-            objects_to_delete = [{"Key": key} for key in file_keys]
+        from ark.database.utils import acquire
+        from ark.database.file_utils import (
+            get_files_by_keys,
+            get_unreferenced_file_keys,
+            lock_file_keys,
+        )
 
-            self.client.delete_objects(
-                Bucket=self.bucket_name, Delete={"Objects": objects_to_delete}
+        try:
+            async with acquire() as conn:
+                async with conn.transaction():
+                    await lock_file_keys(conn, file_keys)
+                    orphaned_keys = await get_unreferenced_file_keys(conn, file_keys)
+            if not orphaned_keys:
+                return True
+
+            await self._run(self._delete_objects, orphaned_keys)
+
+            async with acquire() as conn:
+                rereferenced = await get_files_by_keys(conn, orphaned_keys)
+            missing = await self.arestore_missing(rereferenced)
+            if missing:
+                logger.error(f"Files saved during delete are missing from R2: {missing}")
+            logger.info(
+                f"Deleted {len(orphaned_keys) - len(rereferenced)} of {len(set(file_keys))} "
+                "files from R2, the rest are still referenced"
             )
-
-            logger.info(f"Successfully deleted {len(file_keys)} chat files from R2")
             return True
-
-        except ClientError as e:
-            logger.error(f"Failed to delete chat files: {e}")
-            return False
         except Exception as e:
-            logger.error(f"Unexpected error deleting chat files: {e}")
+            logger.error(f"Failed to delete files from R2: {e}")
             return False
 
-    def download_and_encode_pdf(self, presigned_url: str, filename: str) -> Optional[str]:
+    async def arestore_missing(self, file_refs: list[Dict[str, Any]]) -> list[str]:
         """
-        Download a PDF from a presigned URL and encode it to base64 for OpenRouter
-        
+        Make sure the objects behind newly saved files rows exist
+
+        An upload deduplicated against an object that a concurrent delete then
+        removed leaves its row pointing at nothing. Missing PDFs are uploaded
+        again from the local PDF cache; nothing keeps a local copy of images,
+        so a missing image is logged and returned instead.
+
         Args:
-            presigned_url: The presigned URL to download from
-            filename: Original filename for logging
-            
+            file_refs: FileReference dicts with file_key (and content_hash)
+
         Returns:
-            Base64 encoded PDF data URL or None if failed
+            Keys that are missing and could not be restored
         """
-        try:
-            # Download PDF content from presigned URL
-            response = requests.get(presigned_url, timeout=30)
-            response.raise_for_status()
-            
-            # Encode to base64
-            encoded_content = base64.b64encode(response.content).decode('utf-8')
-            base64_data_url = f"data:application/pdf;base64,{encoded_content}"
-            
-            logger.info(f"Successfully downloaded and encoded PDF: {filename}")
-            return base64_data_url
-            
-        except requests.RequestException as e:
-            logger.error(f"Failed to download PDF {filename} from presigned URL: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error processing PDF {filename}: {e}")
-            return None
+        from ark.services.pdf_cache import pdf_cache
+
+        async def restore(file_ref: Dict[str, Any]) -> Optional[str]:
+            file_key = file_ref["file_key"]
+            try:
+                if await self._run(self._object_exists, file_key):
+                    return None
+                cached_path = pdf_cache.path(file_ref.get("content_hash") or file_key)
+                if cached_path is None:
+                    logger.error(f"Object {file_key} was deleted and can't be restored")
+                    return file_key
+                await self._run(
+                    self.client.upload_file,
+                    str(cached_path),
+                    self.bucket_name,
+                    file_key,
+                    ExtraArgs={"ContentType": file_ref.get("content_type") or "application/pdf"},
+                )
+                logger.info(f"Restored deleted object {file_key} from the PDF cache")
+                return None
+            except Exception as e:
+                logger.error(f"Could not check or restore {file_key}: {e}")
+                return file_key
+
+        results = await asyncio.gather(
+            *(restore(f) for f in file_refs if f.get("file_key"))
+        )
+        return [key for key in results if key]
+
+    async def adownload_to_file(self, file_key: str, dest_path) -> bool:
+        """Async version of download_to_file"""
+        return await self._run(self.download_to_file, file_key, dest_path)
 
 
 # Global instance
@@ -259,16 +635,53 @@ def generate_presigned_url(file_key: str, expiration: int = 86400) -> Optional[s
     return r2_storage.generate_presigned_url(file_key, expiration)
 
 
-def delete_user_files(user_id: str) -> bool:
-    """Delete all files for a specific user"""
-    return r2_storage.delete_user_files(user_id)
+def presigned_url_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the presigned URL cache"""
+    return r2_storage.url_cache.stats()
+
+
+# Async convenience functions
+
+
+async def aupload_file(
+    file_path: str, file_content: bytes, content_type: str, user_id: str
+) -> Optional[Dict[str, Any]]:
+    """Upload a file to R2 storage without blocking the event loop"""
+    return await r2_storage.aupload_file(file_path, file_content, content_type, user_id)
+
+
+async def aupload_stream(
+    file_obj, file_path: str, content_type: str, user_id: str
+) -> Optional[Dict[str, Any]]:
+    """Stream a file to R2 storage in parts without buffering it whole"""
+    return await r2_storage.aupload_stream(file_obj, file_path, content_type, user_id)
+
+
+async def adelete_file(file_key: str) -> bool:
+    """Delete a file from R2 storage without blocking the event loop"""
+    return await r2_storage.adelete_file(file_key)
+
+
+async def agenerate_presigned_url(file_key: str, expiration: int = 86400) -> Optional[str]:
+    """Generate a presigned URL on the R2 executor"""
+    return await r2_storage.agenerate_presigned_url(file_key, expiration)
+
+
+async def adelete_user_files(user_id: str) -> bool:
+    """Delete a user's R2 objects that are no longer referenced"""
+    return await r2_storage.adelete_user_files(user_id)
+
+
+async def adelete_chat_files(file_keys: list[str]) -> bool:
+    """Delete a deleted chat's R2 objects that are no longer referenced"""
+    return await r2_storage.adelete_chat_files(file_keys)
 
 
-def delete_chat_files(file_keys: list[str]) -> bool:
-    """Delete multiple files associated with a chat"""
-    return r2_storage.delete_chat_files(file_keys)
+async def arestore_missing(file_refs: list[Dict[str, Any]]) -> list[str]:
+    """Re-upload objects of saved files rows that a concurrent delete removed"""
+    return await r2_storage.arestore_missing(file_refs)
 
 
-def download_and_encode_pdf(presigned_url: str, filename: str) -> Optional[str]:
-    """Download a PDF from presigned URL and encode to base64"""
-    return r2_storage.download_and_encode_pdf(presigned_url, filename)
+async def adownload_to_file(file_key: str, dest_path) -> bool:
+    """Download an object to a local file without blocking the event loop"""
+    return await r2_storage.adownload_to_file(file_key, dest_path)
@@ -1,9 +1,11 @@
 import reflex as rx
-from typing import List
+import asyncio
+from typing import List, Optional
+from ark.config import DatabaseConfig
 from ark.models.chat import ChatMessage, FileReference
 from ark.handlers.message_handler import message_handler
+from ark.utils.encoding import encode_file_to_data_url, guess_image_mime_type
 import reflex_clerk_api as clerk
-import base64
 import os
 import uuid
 import asyncpg
@@ -21,6 +23,9 @@ class State(rx.State):
     messages: List[ChatMessage] = []
     is_gen: bool = False
     is_streaming: bool = False
+    # Assistant message being generated; kept out of `messages` while streaming
+    # so each UI update only sends this message, not the whole history
+    streaming_message: ChatMessage = {}
     selected_action: str = ""
     img: list[str] = []
     pdf_files: list[str] = []
@@ -28,7 +33,23 @@ class State(rx.State):
     logged_user_name: str = ""
     chat_id: str = ""
     user_chats: List[dict] = []
+    # Keyset cursor for the next page of user_chats ("" when there are no more)
+    chats_cursor: str = ""
+    is_loading_chats: bool = False
+    # Full-text search over chat history
+    search_query: str = ""
+    search_results: List[dict] = []
+    search_cursor: str = ""
     _saving_messages: bool = False
+    # Next message_order to save (high-water mark of persisted messages)
+    _saved_message_count: int = 0
+    # Long chats are loaded a window at a time, newest first
+    has_earlier_messages: bool = False
+    is_loading_earlier: bool = False
+    _earliest_loaded_order: int = 0
+    # Number of leading entries of messages that are already persisted; kept
+    # apart from _saved_message_count since message_order may have gaps
+    _saved_index: int = 0
 
     # Thinking section expansion state
     thinking_expanded: dict[int, bool] = {}
@@ -38,6 +59,8 @@ class State(rx.State):
     # Provider and model selection
     selected_provider: str = ModelConfig.DEFAULT_PROVIDER
     selected_model: str = ModelConfig.CHAT_MODEL
+    # Models offered in the picker, from the model catalog
+    model_options: List[dict] = []
 
     # Theme state
     is_dark_theme: bool = False
@@ -52,6 +75,9 @@ class State(rx.State):
         from ark.database.utils import create_chat
 
         self.chat_id = str(uuid.uuid4())
+        self._saved_message_count = 0
+        self._saved_index = 0
+        self.has_earlier_messages = False
         self.is_mobile_menu_open = False
 
         # Get user ID from Clerk
@@ -72,6 +98,7 @@ class State(rx.State):
         """Handle loading a chat page - either load existing chat or process new message."""
         # Get the conversation ID from the URL
         conversation_id = self.router.page.params.get("conversation", "")
+        self.load_model_options()
 
         if conversation_id and conversation_id != self.chat_id:
             # This is an existing chat, load its history
@@ -99,13 +126,23 @@ class State(rx.State):
         self.selected_model = model
         print(f"Provider set to: {provider}, Model: {model or 'default'}")
 
-    def handle_generation(self):
+    def load_model_options(self):
+        """Fill the model picker from the catalog (cached on disk, refreshed in the background)"""
+        from ark.providers.catalog import model_catalog
+
+        self.model_options = [
+            {"id": info["id"], "name": info["name"]}
+            for info in model_catalog.chat_models()
+        ]
+
+    async def handle_generation(self):
         self.is_gen = True
 
         # Create content array starting with text
         content = [{"type": "text", "text": self.prompt}]
 
         # Process R2 uploaded files first (preferred method)
+        r2_pdfs = []
         for file_ref in self.uploaded_files:
             if file_ref.get("type") == "image" and file_ref.get("presigned_url"):
                 # Use presigned URL for images (OpenRouter can fetch external images)
@@ -114,38 +151,37 @@ class State(rx.State):
                     {"type": "image_url", "image_url": {"url": file_ref["presigned_url"]}}
                 )
             elif file_ref.get("type") == "pdf" and file_ref.get("file_key"):
-                # Download and encode PDFs for AI processing
-                try:
-                    from ark.services.r2_storage import download_and_encode_pdf, generate_presigned_url
-                    # Generate fresh presigned URL for PDF download
-                    presigned_url = generate_presigned_url(file_ref["file_key"])
-                    if presigned_url:
-                        pdf_base64 = download_and_encode_pdf(presigned_url, file_ref.get("original_filename", "document.pdf"))
-                        if pdf_base64:
-                            content.append(
-                                {
-                                    "type": "file",
-                                    "file": {
-                                        "filename": file_ref.get("original_filename", "document.pdf"),
-                                        "file_data": pdf_base64,
-                                    },
-                                }
-                            )
-                except Exception as e:
-                    print(f"Error processing R2 PDF {file_ref.get('original_filename')}: {e}")
-
-        # Fallback to legacy base64 processing (for offline users or R2 failures)
-        if self.img:
-            base64_images = self.base64_imgs
-            if base64_images:
-                if not self.current_message_image:  # Only if no R2 image was set
-                    self.current_message_image = base64_images[0]
-                content.append(
-                    {"type": "image_url", "image_url": {"url": base64_images[0]}}
-                )
+                r2_pdfs.append(file_ref)
 
-        if self.pdf_files:
-            base64_pdfs = self.base64_pdfs
+        # Download and encode PDFs for AI processing, all at once
+        if r2_pdfs:
+            pdf_results = await asyncio.gather(
+                *(self._download_r2_pdf(file_ref) for file_ref in r2_pdfs)
+            )
+            for file_ref, pdf_base64 in zip(r2_pdfs, pdf_results):
+                if pdf_base64:
+                    content.append(
+                        {
+                            "type": "file",
+                            "file": {
+                                "filename": file_ref.get("original_filename", "document.pdf"),
+                                "file_data": pdf_base64,
+                            },
+                        }
+                    )
+
+        # Fallback to legacy base64 processing (for offline users or R2 failures).
+        # Each local upload is encoded exactly once here and reused below.
+        base64_images, base64_pdfs = self._encode_pending_uploads()
+
+        if base64_images:
+            if not self.current_message_image:  # Only if no R2 image was set
+                self.current_message_image = base64_images[0]["data"]
+            content.append(
+                {"type": "image_url", "image_url": {"url": base64_images[0]["data"]}}
+            )
+
+        if base64_pdfs:
             for pdf_data in base64_pdfs:
                 content.append(
                     {
@@ -164,19 +200,16 @@ class State(rx.State):
         files_metadata.extend(self.uploaded_files)
         
         # Add legacy base64 files metadata (fallback)
-        base64_images = self.base64_imgs
-        for i, filename in enumerate(self.img):
-            base64_url = base64_images[i] if i < len(base64_images) else None
-            if base64_url:  # Only add if we have valid base64 data
-                files_metadata.append({
-                    "filename": filename,
-                    "content_type": f"image/{filename.split('.')[-1].lower()}",
-                    "type": "image",
-                    "base64_url": base64_url  # Add base64 data for display
-                })
+        for image_data in base64_images:
+            filename = image_data["filename"]
+            files_metadata.append({
+                "filename": filename,
+                "content_type": f"image/{filename.split('.')[-1].lower()}",
+                "type": "image",
+                "base64_url": image_data["data"]  # Add base64 data for display
+            })
             
         # Add PDF files metadata with base64 data
-        base64_pdfs = self.base64_pdfs
         for pdf_data in base64_pdfs:
             if pdf_data.get("data"):  # Only add if we have valid base64 data
                 files_metadata.append({
@@ -195,6 +228,24 @@ class State(rx.State):
         self.messages.append(user_message)
         self.prompt = ""
 
+        # The encoded copies now live in the message; drop the local files
+        self._remove_local_uploads(self.img + self.pdf_files)
+
+    async def _download_r2_pdf(self, file_ref: FileReference) -> Optional[str]:
+        """Return an uploaded PDF as a base64 data URL, downloading from R2 only on a cache miss"""
+        from ark.services.pdf_cache import pdf_cache
+        from ark.services.r2_storage import adownload_to_file
+
+        file_key = file_ref["file_key"]
+        try:
+            return await pdf_cache.afetch(
+                file_ref.get("content_hash") or file_key,
+                lambda path: adownload_to_file(file_key, path),
+            )
+        except Exception as e:
+            print(f"Error processing R2 PDF {file_ref.get('original_filename', 'document.pdf')}: {e}")
+        return None
+
     async def reset_chat(self):
         """Reset chat and save current conversation"""
         from ark.database.utils import save_all_messages
@@ -203,7 +254,11 @@ class State(rx.State):
         if self.chat_id and self.messages:
             clerk_state = await self.get_state(clerk.ClerkState)
             if clerk_state.is_signed_in:
-                await save_all_messages(self.chat_id, self.messages)
+                await save_all_messages(
+                    self.chat_id,
+                    self.messages[self._saved_index:],
+                    start_order=self._saved_message_count,
+                )
 
         # Clear state
         self.img = []
@@ -217,6 +272,9 @@ class State(rx.State):
         self.thinking_expanded = {}
         self.citations_expanded = {}
         self.chat_id = ""
+        self._saved_message_count = 0
+        self._saved_index = 0
+        self.has_earlier_messages = False
         self.current_message_image = ""
         self.is_mobile_menu_open = False
 
@@ -244,57 +302,54 @@ class State(rx.State):
             # If last message is assistant, don't allow sending another message
             return
 
-        # Set streaming state
+        # Set streaming state with an empty assistant message to fill in
         self.is_streaming = True
-        yield
-
-        # Determine model based on action and selection
-        model = self._get_model_for_action()
-
-        # Add empty assistant message that will be filled during streaming
-        assistant_message = {
+        self.streaming_message = {
             "role": "assistant",
             "content": "",
             "display_text": "",
         }
-        self.messages.append(assistant_message)
         yield
 
+        # Determine model based on action and selection
+        model = self._get_model_for_action()
+
+        final_message = None
         try:
-            # Process the message with streaming
+            # Process the message with streaming; partial updates arrive
+            # already coalesced on the StreamingConfig time/size budget
             async for (
                 partial_message,
                 is_complete,
             ) in message_handler.process_message_stream(
-                messages=self.messages[
-                    :-1
-                ],  # Exclude the empty assistant message we just added
+                messages=self.messages,
                 provider=self.selected_provider,
                 model=model,
                 action=self.selected_action,
             ):
-                # Update the last message (assistant message) with streaming content
-                self.messages[-1] = partial_message
-                # Force Reflex to detect the state change
-                self.messages = self.messages
-
-                # Yield to update UI
-                yield
-
                 # If this is the final complete message, break
                 if is_complete:
+                    final_message = partial_message
                     break
 
+                self.streaming_message = partial_message
+
+                # Yield to update UI
+                yield
+
         except Exception as e:
-            # Handle errors by updating the last message with error info
-            self.messages[-1] = {
+            # Handle errors by replacing the assistant message with error info
+            final_message = {
                 "role": "assistant",
                 "content": f"Error: {str(e)}",
                 "display_text": f"Error: {str(e)}",
             }
-            yield
 
         finally:
+            # Move the finished message into the history in a single update
+            self.messages.append(final_message or self.streaming_message)
+            self.streaming_message = {}
+
             # Reset streaming state
             self.is_streaming = False
             self.is_gen = False
@@ -303,17 +358,11 @@ class State(rx.State):
             # Save messages to database if chat_id exists
             if self.chat_id:
                 # Save all messages that aren't saved yet
-                import asyncio
-
                 asyncio.create_task(self._save_current_messages())
 
     async def _save_current_messages(self):
         """Save current messages to database"""
-        from ark.database.utils import (
-            save_message_from_dict,
-            update_chat_title,
-            get_message_count,
-        )
+        from ark.database.utils import save_messages_batch
 
         # Prevent concurrent saves
         if self._saving_messages:
@@ -326,37 +375,30 @@ class State(rx.State):
             if not clerk_state.is_signed_in or not self.chat_id:
                 return
 
-            # Get current message count in DB to know which messages to save
-            db_count = await get_message_count(self.chat_id)
-
-            # Only save messages that aren't already in the database
-            if db_count < len(self.messages):
-                # Save any new messages with manual order tracking
-                for i in range(db_count, len(self.messages)):
-                    message = self.messages[i].copy()  # Make a copy to avoid modifying original
-                    # Add user_id for R2 upload if this is a user message with files
-                    if message.get("role") == "user" and message.get("files"):
-                        message["user_id"] = clerk_state.user_id
-                    message_order = i  # Use the index as the order
-                    try:
-                        await save_message_from_dict(
-                            self.chat_id, message_order, message
-                        )
-                        print(f"Saved message {message_order} successfully")
-                    except Exception as e:
-                        print(f"Error saving message {message_order}: {e}")
-                        # If it's a duplicate key error, skip it
-                        if "duplicate key" in str(e):
-                            continue
-                        else:
-                            break
-
-                # Update chat title with first user message if not set
-                if len(self.messages) > 0 and self.messages[0].get("role") == "user":
-                    first_message = self.messages[0].get("display_text", "New Chat")[
-                        :100
-                    ]
-                    await update_chat_title(self.chat_id, first_message)
+            # Only save messages past the persisted high-water mark
+            start_order = self._saved_message_count
+            if self._saved_index >= len(self.messages):
+                return
+
+            pending = []
+            for message in self.messages[self._saved_index:]:
+                message = message.copy()  # Make a copy to avoid modifying original
+                # Add user_id for R2 upload if this is a user message with files
+                if message.get("role") == "user" and message.get("files"):
+                    message["user_id"] = clerk_state.user_id
+                pending.append(message)
+
+            # Title the chat with the first user message on its first save
+            title = None
+            if start_order == 0 and self.messages[0].get("role") == "user":
+                title = self.messages[0].get("display_text", "New Chat")[:100]
+
+            high_water = await save_messages_batch(
+                self.chat_id, start_order, pending, title=title
+            )
+            if high_water is not None:
+                self._saved_message_count = high_water
+                self._saved_index += len(pending)
 
         finally:
             self._saving_messages = False
@@ -415,69 +457,63 @@ class State(rx.State):
         """Handle auth actions and close mobile menu"""
         self.close_mobile_menu()
 
-    @rx.var
-    def base64_imgs(self) -> list[str]:
-        """Return a list of base64 data URLs for all uploaded images."""
-        base64_list = []
-        upload_dir = rx.get_upload_dir()
-        for filename in self.img:
-            image_path = upload_dir / filename
-            try:
-                base64_list.append(self.encode_image_to_base64(str(image_path)))
-                os.remove(image_path)
-            except Exception:
-                # If file not found or error, skip
-                continue
-        return base64_list
-
-    @staticmethod
-    def encode_image_to_base64(image_path: str) -> str:
-        """Encode an image file to a base64 data URL.
+    def _encode_pending_uploads(self) -> tuple[list[dict], list[dict]]:
+        """Encode the locally stored uploads of the pending message, once each.
 
-        Args:
-            image_path: The path to the image file.
+        Files that can't be read are skipped.
 
         Returns:
-            The base64 data URL of the image.
+            A tuple of (images, PDFs), each a list of {"filename", "data"} dicts
+            where data is a base64 data URL.
         """
-        with open(image_path, "rb") as image_file:
-            encoded = base64.b64encode(image_file.read()).decode("utf-8")
-        # Guess MIME type from extension (simple version)
-        if image_path.lower().endswith(".png"):
-            mime = "image/png"
-        else:
-            mime = "image/jpeg"
-        return f"data:{mime};base64,{encoded}"
+        upload_dir = rx.get_upload_dir()
+        encoded: dict[str, str] = {}  # filename -> data URL, for this message only
 
-    @staticmethod
-    def encode_pdf_to_base64(pdf_path: str) -> str:
-        """Encode a PDF file to a base64 data URL.
+        def encode(filename: str, mime_type: str) -> Optional[str]:
+            if filename not in encoded:
+                try:
+                    encoded[filename] = encode_file_to_data_url(
+                        upload_dir / filename, mime_type
+                    )
+                except OSError as e:
+                    print(f"Could not encode upload {filename}: {e}")
+                    return None
+            return encoded[filename]
+
+        base64_images = []
+        for filename in self.img:
+            data_url = encode(filename, guess_image_mime_type(filename))
+            if data_url:
+                base64_images.append({"filename": filename, "data": data_url})
 
-        Args:
-            pdf_path: The path to the PDF file.
+        base64_pdfs = []
+        for filename in self.pdf_files:
+            data_url = encode(filename, "application/pdf")
+            if data_url:
+                base64_pdfs.append({"filename": filename, "data": data_url})
 
-        Returns:
-            The base64 data URL of the PDF.
-        """
-        with open(pdf_path, "rb") as pdf_file:
-            encoded = base64.b64encode(pdf_file.read()).decode("utf-8")
-        return f"data:application/pdf;base64,{encoded}"
+        return base64_images, base64_pdfs
 
-    @rx.var
-    def base64_pdfs(self) -> list[dict]:
-        """Return a list of base64 data URLs for all uploaded PDFs with filenames."""
-        pdf_list = []
+    @staticmethod
+    async def _save_upload_locally(file: rx.UploadFile, chunk_size: int = 1024 * 1024):
+        """Copy an upload into the upload dir chunk by chunk, from the start."""
+        await file.seek(0)
+        outfile = rx.get_upload_dir() / file.name
+        with outfile.open("wb") as file_object:
+            while chunk := await file.read(chunk_size):
+                file_object.write(chunk)
+
+    @staticmethod
+    def _remove_local_uploads(filenames: list[str]):
+        """Delete locally stored uploads, ignoring files that are already gone."""
         upload_dir = rx.get_upload_dir()
-        for filename in self.pdf_files:
-            pdf_path = upload_dir / filename
+        for filename in filenames:
             try:
-                base64_data = self.encode_pdf_to_base64(str(pdf_path))
-                pdf_list.append({"filename": filename, "data": base64_data})
-                os.remove(pdf_path)
-            except Exception:
-                # If file not found or error, skip
+                os.remove(upload_dir / filename)
+            except FileNotFoundError:
                 continue
-        return pdf_list
+            except OSError as e:
+                print(f"Could not remove local file {filename}: {e}")
 
     @rx.event
     async def handle_upload(self, files: list[rx.UploadFile]):
@@ -486,70 +522,71 @@ class State(rx.State):
         Args:
             files: The uploaded files.
         """
-        from ark.services.r2_storage import upload_file, generate_presigned_url
+        from ark.services.r2_storage import aupload_stream, generate_presigned_url
+        from ark.services.pdf_cache import pdf_cache
         
         clerk_state = await self.get_state(clerk.ClerkState)
-        
-        for file in files:
+
+        # Stream each file straight to R2 if user is signed in; nothing is
+        # staged locally and only a few parts per file are held in memory
+        r2_results = [None] * len(files)
+        if clerk_state.is_signed_in:
+            r2_results = await asyncio.gather(
+                *(
+                    aupload_stream(
+                        file,
+                        file_path=file.name,
+                        content_type=file.content_type or "application/octet-stream",
+                        user_id=clerk_state.user_id,
+                    )
+                    for file in files
+                ),
+                return_exceptions=True,
+            )
+
+        for file, r2_metadata in zip(files, r2_results):
+            if isinstance(r2_metadata, Exception):
+                print(f"R2 upload failed for {file.name}: {r2_metadata}")
+                r2_metadata = None
+
+            if r2_metadata:
+                # Generate presigned URL
+                presigned_url = generate_presigned_url(r2_metadata['file_key'])
+
+                # Create FileReference for R2 file
+                file_ref: FileReference = {
+                    'file_key': r2_metadata['file_key'],
+                    'original_filename': file.name,
+                    'content_type': file.content_type or "application/octet-stream",
+                    'file_size': r2_metadata['size'],
+                    'content_hash': r2_metadata['content_hash'],
+                    'type': "pdf" if file.name.lower().endswith(".pdf") else "image",
+                    'presigned_url': presigned_url
+                }
+                self.uploaded_files.append(file_ref)
+                print(f"Successfully uploaded {file.name} to R2")
+
+                # Keep a local copy so sending the message needs no download
+                if file_ref['type'] == "pdf":
+                    await pdf_cache.astore_stream(r2_metadata['content_hash'], file)
+                continue
+
+            # Fallback to legacy base64 system if R2 failed or user not signed in
             try:
-                upload_data = await file.read()
-                
-                # Save to local storage (needed for fallback and R2 upload)
-                outfile = rx.get_upload_dir() / file.name
-                with outfile.open("wb") as file_object:
-                    file_object.write(upload_data)
-                
-                # Try R2 upload if user is signed in
-                r2_success = False
-                if clerk_state.is_signed_in:
-                    try:
-                        r2_metadata = upload_file(
-                            file_path=file.name,
-                            file_content=upload_data,
-                            content_type=file.content_type or "application/octet-stream",
-                            user_id=clerk_state.user_id
-                        )
-                        
-                        if r2_metadata:
-                            # Generate presigned URL
-                            presigned_url = generate_presigned_url(r2_metadata['file_key'])
-                            
-                            # Create FileReference for R2 file
-                            file_ref: FileReference = {
-                                'file_key': r2_metadata['file_key'],
-                                'original_filename': file.name,
-                                'content_type': file.content_type or "application/octet-stream",
-                                'file_size': len(upload_data),
-                                'type': "pdf" if file.name.lower().endswith(".pdf") else "image",
-                                'presigned_url': presigned_url
-                            }
-                            self.uploaded_files.append(file_ref)
-                            r2_success = True
-                            print(f"Successfully uploaded {file.name} to R2")
-                            
-                            # Clean up local file after successful R2 upload
-                            try:
-                                os.remove(outfile)
-                                print(f"Cleaned up local file: {file.name}")
-                            except Exception as cleanup_e:
-                                print(f"Could not remove local file {file.name}: {cleanup_e}")
-                            
-                    except Exception as e:
-                        print(f"R2 upload failed for {file.name}: {e}")
-                
-                # Fallback to legacy base64 system if R2 failed or user not signed in
-                if not r2_success:
-                    if file.name.lower().endswith(".pdf"):
-                        self.pdf_files.append(file.name)
-                    else:
-                        self.img.append(file.name)
-                        
+                await self._save_upload_locally(file)
             except Exception as e:
                 print(f"Error processing file {file.name}: {e}")
+                continue
+
+            if file.name.lower().endswith(".pdf"):
+                self.pdf_files.append(file.name)
+            else:
+                self.img.append(file.name)
 
     @rx.event
     def clear_images(self):
         """Clear the uploaded images list."""
+        self._remove_local_uploads(self.img)
         self.img = []
         # Also clear image files from uploaded_files
         self.uploaded_files = [f for f in self.uploaded_files if f.get("type") != "image"]
@@ -557,6 +594,7 @@ class State(rx.State):
     @rx.event
     def clear_pdfs(self):
         """Clear the uploaded PDFs list."""
+        self._remove_local_uploads(self.pdf_files)
         self.pdf_files = []
         # Also clear PDF files from uploaded_files
         self.uploaded_files = [f for f in self.uploaded_files if f.get("type") != "pdf"]
@@ -564,177 +602,284 @@ class State(rx.State):
     @rx.event
     def clear_all_files(self):
         """Clear all uploaded files."""
+        self._remove_local_uploads(self.img + self.pdf_files)
         self.img = []
         self.pdf_files = []
         self.uploaded_files = []
 
+    @rx.var
+    def has_more_chats(self) -> bool:
+        return self.chats_cursor != ""
+
     @rx.event
     async def load_user_chats(self):
-        """Load user's chats from database"""
-        from ark.database.utils import get_user_chats
+        """Load the first page of the user's chats from database"""
+        from ark.database.utils import get_user_chats_page
 
         clerk_state = await self.get_state(clerk.ClerkState)
         if not clerk_state.is_signed_in:
             self.user_chats = []
+            self.chats_cursor = ""
             return
 
-        chats = await get_user_chats(clerk_state.user_id, limit=50)
+        chats, next_cursor = await get_user_chats_page(clerk_state.user_id)
         self.user_chats = chats
+        self.chats_cursor = next_cursor or ""
+
+    @rx.event
+    async def load_more_chats(self):
+        """Append the next page of the user's chats (infinite scroll)"""
+        from ark.database.utils import get_user_chats_page
+
+        if not self.chats_cursor or self.is_loading_chats:
+            return
+
+        clerk_state = await self.get_state(clerk.ClerkState)
+        if not clerk_state.is_signed_in:
+            return
+
+        self.is_loading_chats = True
+        yield
+
+        try:
+            chats, next_cursor = await get_user_chats_page(
+                clerk_state.user_id, cursor=self.chats_cursor
+            )
+            self.user_chats.extend(chats)
+            self.chats_cursor = next_cursor or ""
+        finally:
+            self.is_loading_chats = False
+
+    @rx.var
+    def has_more_search_results(self) -> bool:
+        return self.search_cursor != ""
+
+    @rx.event
+    async def search_chats(self, query: str):
+        """Run a full-text search over the user's chats (first page)"""
+        from ark.database.utils import search_user_chats
+
+        self.search_query = query
+        if not query.strip():
+            self.search_results = []
+            self.search_cursor = ""
+            return
+
+        clerk_state = await self.get_state(clerk.ClerkState)
+        if not clerk_state.is_signed_in:
+            return
+
+        results, next_cursor = await search_user_chats(clerk_state.user_id, query)
+        self.search_results = results
+        self.search_cursor = next_cursor or ""
+
+    @rx.event
+    async def load_more_search_results(self):
+        """Append the next page of search results (infinite scroll)"""
+        from ark.database.utils import search_user_chats
+
+        if not self.search_cursor or self.is_loading_chats:
+            return
+
+        clerk_state = await self.get_state(clerk.ClerkState)
+        if not clerk_state.is_signed_in:
+            return
+
+        self.is_loading_chats = True
+        yield
+
+        try:
+            results, next_cursor = await search_user_chats(
+                clerk_state.user_id, self.search_query, cursor=self.search_cursor
+            )
+            self.search_results.extend(results)
+            self.search_cursor = next_cursor or ""
+        finally:
+            self.is_loading_chats = False
 
     @rx.event
     async def load_chat_history(self, chat_id: str):
         """Load chat history from database and set provider/model"""
-        from ark.database.utils import get_chat_messages, chat_exists, get_chat, get_connection
-        from ark.database.file_utils import get_chat_files
-        from ark.services.r2_storage import generate_presigned_url
+        from ark.database.utils import load_chat_bundle
 
         clerk_state = await self.get_state(clerk.ClerkState)
         if not clerk_state.is_signed_in:
             return
 
-        # Verify user owns this chat and get chat metadata
-        if await chat_exists(chat_id, clerk_state.user_id):
-            # Load chat metadata (provider/model)
-            chat_data = await get_chat(chat_id)
-            if chat_data:
-                self.selected_provider = chat_data.get(
-                    "initial_provider", ModelConfig.DEFAULT_PROVIDER
-                )
-                self.selected_model = chat_data.get(
-                    "initial_model", ModelConfig.CHAT_MODEL
-                )
-                print(
-                    f"Loaded chat {chat_id} with provider: {self.selected_provider}, model: {self.selected_model}"
-                )
+        # Ownership check, metadata, the latest messages and their files in one round trip
+        bundle = await load_chat_bundle(
+            chat_id, clerk_state.user_id, limit=DatabaseConfig.MESSAGE_PAGE_SIZE
+        )
+        if bundle is None:
+            return
 
-            # Load chat files from R2
-            file_references = []
-            conn = await get_connection()
-            try:
-                chat_files = await get_chat_files(conn, chat_id)
-                print(f"Found {len(chat_files)} files in database for chat {chat_id}")
-                
-                # Convert to FileReference and generate presigned URLs
-                for file_data in chat_files:
-                    try:
-                        presigned_url = generate_presigned_url(file_data['file_key'])
-                        if presigned_url:  # Only add files with valid presigned URLs
-                            # Determine file type from content_type
-                            file_type = "pdf" if file_data['content_type'] == "application/pdf" else "image"
-                            
-                            file_ref: FileReference = {
-                                'file_id': str(file_data['id']),
-                                'file_key': file_data['file_key'],
-                                'original_filename': file_data['original_filename'],
-                                'content_type': file_data['content_type'],
-                                'file_size': file_data['file_size'],
-                                'type': file_type,
-                                'presigned_url': presigned_url
-                            }
-                            file_references.append(file_ref)
-                            print(f"✓ Loaded file: {file_data['original_filename']} ({file_type}) with URL: {presigned_url[:50]}...")
-                        else:
-                            print(f"✗ Failed to generate presigned URL for file: {file_data['original_filename']}")
-                    except Exception as e:
-                        print(f"✗ Error processing file {file_data.get('original_filename', 'unknown')}: {e}")
-                        continue
-                        
-            except Exception as e:
-                print(f"Error loading chat files: {e}")
-            finally:
-                await conn.close()
-                
-            print(f"Successfully loaded {len(file_references)} files with valid URLs")
+        chat_data = bundle["chat"]
+        self.selected_provider = (
+            chat_data.get("initial_provider") or ModelConfig.DEFAULT_PROVIDER
+        )
+        self.selected_model = chat_data.get("initial_model") or ModelConfig.CHAT_MODEL
+        print(
+            f"Loaded chat {chat_id} with provider: {self.selected_provider}, model: {self.selected_model}"
+        )
 
-            # Load messages
-            db_messages = await get_chat_messages(chat_id)
+        self.messages = self._chat_messages_from_bundle(bundle)
+        print(f"Found {len(bundle['files'])} files in database for chat {chat_id}")
 
-            # Convert database messages to your ChatMessage format
-            self.messages = []
-            
-            # Find which message should get the files (look for multimodal content)
-            message_with_files_index = None
-            for i, msg in enumerate(db_messages):
-                if (msg["role"] == "user" and 
-                    isinstance(msg["content"], list) and 
-                    any(item.get("type") in ["image_url", "file"] for item in msg["content"] if isinstance(item, dict))):
-                    message_with_files_index = i
-                    break
-            
-            # If no multimodal content found, use first user message
-            if message_with_files_index is None:
-                for i, msg in enumerate(db_messages):
-                    if msg["role"] == "user":
-                        message_with_files_index = i
-                        break
-            
-            for i, msg in enumerate(db_messages):
-                # Handle content based on role and structure
-                if isinstance(msg["content"], list):
-                    if msg["role"] == "assistant":
-                        # For assistant messages, extract text from content list for UI compatibility
-                        content_text = ""
-                        for item in msg["content"]:
-                            if isinstance(item, dict) and item.get("type") == "text":
-                                content_text = item.get("text", "")
-                                break
-                        content = content_text
-                    else:
-                        # For user messages, update image/file URLs with fresh presigned URLs
-                        content = msg["content"]
-                        
-                        # Create a mapping of files by type for better matching
-                        image_files = [f for f in file_references if f.get('type') == 'image']
-                        pdf_files = [f for f in file_references if f.get('type') == 'pdf']
-                        
-                        for item in msg["content"]:
-                            if isinstance(item, dict):
-                                if item.get("type") == "image_url" and image_files:
-                                    # Use the first available image file
-                                    item["image_url"]["url"] = image_files[0]['presigned_url']
-                                    print(f"Updated image URL with fresh presigned URL: {image_files[0]['presigned_url'][:50]}...")
-                                elif item.get("type") == "file" and pdf_files:
-                                    # Update PDF file data if needed (though it's usually base64)
-                                    print(f"Found PDF file reference: {pdf_files[0]['original_filename']}")
+        self.chat_id = chat_id
+        self.has_earlier_messages = bundle["has_earlier"]
+        self._earliest_loaded_order = (
+            bundle["messages"][0]["message_order"] if bundle["messages"] else 0
+        )
+        # New messages are numbered after everything stored, loaded or not
+        self._saved_message_count = bundle["next_order"]
+        self._saved_index = len(self.messages)
+        self.is_mobile_menu_open = False
+        print(f"Loaded {len(self.messages)} messages for chat {chat_id}")
+
+    @rx.event
+    async def load_earlier_messages(self):
+        """Prepend the previous page of messages to the open chat"""
+        from ark.database.utils import load_chat_bundle
+
+        if not self.has_earlier_messages or self.is_loading_earlier or not self.chat_id:
+            return
+
+        clerk_state = await self.get_state(clerk.ClerkState)
+        if not clerk_state.is_signed_in:
+            return
+
+        self.is_loading_earlier = True
+        yield
+
+        try:
+            bundle = await load_chat_bundle(
+                self.chat_id,
+                clerk_state.user_id,
+                before_order=self._earliest_loaded_order,
+                limit=DatabaseConfig.MESSAGE_PAGE_SIZE,
+            )
+            if bundle is None or not bundle["messages"]:
+                self.has_earlier_messages = False
+                return
+
+            earlier = self._chat_messages_from_bundle(bundle)
+            self.messages = earlier + self.messages
+            # Expanded sections are tracked by message index, which just shifted
+            shift = len(earlier)
+            self.thinking_expanded = {i + shift: v for i, v in self.thinking_expanded.items()}
+            self.citations_expanded = {i + shift: v for i, v in self.citations_expanded.items()}
+            self._saved_index += shift
+            self._earliest_loaded_order = bundle["messages"][0]["message_order"]
+            self.has_earlier_messages = bundle["has_earlier"]
+        finally:
+            self.is_loading_earlier = False
+
+    @staticmethod
+    def _chat_messages_from_bundle(bundle: dict) -> List[ChatMessage]:
+        """Convert the messages of a load_chat_bundle result into ChatMessages"""
+        db_messages = bundle["messages"]
+        files_by_order = State._group_chat_files(bundle["files"], db_messages)
+
+        # Convert database messages to your ChatMessage format
+        messages = []
+        for msg in db_messages:
+            file_references = files_by_order.get(msg["message_order"], [])
+
+            # Handle content based on role and structure
+            content = msg["content"]
+            if isinstance(content, list):
+                if msg["role"] == "assistant":
+                    # For assistant messages, extract text from content list for UI compatibility
+                    content = next(
+                        (
+                            item.get("text", "")
+                            for item in content
+                            if isinstance(item, dict) and item.get("type") == "text"
+                        ),
+                        "",
+                    )
                 else:
-                    content = msg["content"]
+                    # Images stored as R2 references are resolved when a request
+                    # needs them; older rows get fresh presigned URLs, in order
+                    image_urls = iter(
+                        f["presigned_url"] for f in file_references if f["type"] == "image"
+                    )
+                    for item in content:
+                        if (
+                            isinstance(item, dict)
+                            and item.get("type") == "image_url"
+                            and "file_key" not in item["image_url"]
+                        ):
+                            url = next(image_urls, None)
+                            if url:
+                                item["image_url"]["url"] = url
+
+            chat_message = {
+                "role": msg["role"],
+                "content": content,
+                "display_text": msg["display_text"],
+            }
 
-                chat_message = {
-                    "role": msg["role"],
-                    "content": content,
-                    "display_text": msg["display_text"],
-                }
+            # Add file references to the message they were uploaded with
+            if msg["role"] == "user" and file_references:
+                chat_message["files"] = file_references
+
+            # Add optional fields if they exist
+            if msg.get("thinking"):
+                chat_message["thinking"] = msg["thinking"]
+            if msg.get("citations"):
+                chat_message["citations"] = msg["citations"]
+            if msg.get("generation_time"):
+                chat_message["generation_time"] = msg["generation_time"]
+            if msg.get("total_tokens"):
+                chat_message["total_tokens"] = msg["total_tokens"]
+            if msg.get("tokens_per_second"):
+                chat_message["tokens_per_second"] = round(msg["tokens_per_second"])
+
+            messages.append(chat_message)
+        return messages
+
+    @staticmethod
+    def _group_chat_files(
+        chat_files: List[dict], db_messages: List[dict]
+    ) -> dict[int, List[FileReference]]:
+        """
+        Build FileReferences with presigned URLs, keyed by the message_order
+        they belong to. Files not matched to a message go on the first user message.
+        """
+        from ark.services.r2_storage import generate_presigned_url
+
+        first_user_order = next(
+            (msg["message_order"] for msg in db_messages if msg["role"] == "user"), None
+        )
+        files_by_order: dict[int, List[FileReference]] = {}
+        for file_data in chat_files:
+            presigned_url = generate_presigned_url(file_data["file_key"])
+            if not presigned_url:
+                print(f"✗ Failed to generate presigned URL for file: {file_data['original_filename']}")
+                continue
 
-                # Add file references to the appropriate message
-                if msg["role"] == "user" and file_references and i == message_with_files_index:
-                    chat_message["files"] = file_references
-                    print(f"Added {len(file_references)} files to user message {i}")
-                    for file_ref in file_references:
-                        print(f"  - {file_ref.get('original_filename')}: {file_ref.get('presigned_url')[:50]}..." if file_ref.get('presigned_url') else f"  - {file_ref.get('original_filename')}: NO URL")
-
-                # Add optional fields if they exist
-                if msg.get("thinking"):
-                    chat_message["thinking"] = msg["thinking"]
-                if msg.get("citations"):
-                    chat_message["citations"] = msg["citations"]
-                if msg.get("generation_time"):
-                    chat_message["generation_time"] = msg["generation_time"]
-                if msg.get("total_tokens"):
-                    chat_message["total_tokens"] = msg["total_tokens"]
-                if msg.get("tokens_per_second"):
-                    chat_message["tokens_per_second"] = round(msg["tokens_per_second"])
-
-                self.messages.append(chat_message)
-
-            self.chat_id = chat_id
-            self.is_mobile_menu_open = False
-            print(f"Loaded {len(self.messages)} messages for chat {chat_id}")
+            file_ref: FileReference = {
+                "file_id": str(file_data["id"]),
+                "file_key": file_data["file_key"],
+                "original_filename": file_data["original_filename"],
+                "content_type": file_data["content_type"],
+                "file_size": file_data["file_size"],
+                "content_hash": file_data["content_hash"],
+                "type": "pdf" if file_data["content_type"] == "application/pdf" else "image",
+                "presigned_url": presigned_url,
+            }
+            order = file_data["message_order"]
+            if order is None:
+                order = first_user_order
+            files_by_order.setdefault(order, []).append(file_ref)
+        return files_by_order
 
     @rx.event
     async def delete_chat(self, chat_id: str):
         """Delete a chat and all its messages and files"""
-        from ark.database.utils import delete_chat, get_connection
-        from ark.services.r2_storage import delete_chat_files
+        from ark.database.utils import delete_chat, acquire
+        from ark.services.r2_storage import adelete_chat_files
 
         clerk_state = await self.get_state(clerk.ClerkState)
         if not clerk_state.is_signed_in:
@@ -742,28 +887,31 @@ class State(rx.State):
 
         try:
             # Get file keys for cleanup before deleting chat
-            conn = await get_connection()
-            try:
-                from ark.database.file_utils import get_chat_file_keys
+            from ark.database.file_utils import get_chat_file_keys
+            async with acquire() as conn:
                 file_keys = await get_chat_file_keys(conn, chat_id)
-            finally:
-                await conn.close()
-
-            # Delete files from R2 storage
-            if file_keys:
-                delete_chat_files(file_keys)
 
             # Delete the chat (this will also delete messages and file metadata due to foreign key cascade)
             success = await delete_chat(chat_id, clerk_state.user_id)
 
             if success:
+                # Delete files from R2 storage once no other chat references them
+                if file_keys:
+                    await adelete_chat_files(file_keys)
+
                 # Refresh the chat list from database to ensure UI is updated
                 await self.load_user_chats()
+                self.search_results = [
+                    chat for chat in self.search_results if str(chat["id"]) != chat_id
+                ]
 
                 # If the deleted chat is the current chat, reset the current chat
                 if self.chat_id == chat_id:
                     self.chat_id = ""
                     self.messages = []
+                    self._saved_message_count = 0
+                    self._saved_index = 0
+                    self.has_earlier_messages = False
             
                 # Show success toast
                 return rx.toast.success("Chat deleted successfully")
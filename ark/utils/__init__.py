@@ -2,5 +2,6 @@
 Utility functions and constants for the Ark application.
 """
 from .logging import save_messages_to_log
+from .encoding import encode_file_to_data_url
 
-__all__ = ["save_messages_to_log"]
\ No newline at end of file
+__all__ = ["save_messages_to_log", "encode_file_to_data_url"]
\ No newline at end of file
@@ -0,0 +1,47 @@
+import base64
+from typing import Optional, Tuple
+
+# Must be a multiple of 3 so each chunk encodes without base64 padding
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def encode_file_to_data_url(path, mime_type: str, chunk_size: int = ENCODE_CHUNK_SIZE) -> str:
+    """
+    Encode a file as a base64 data URL, reading it in fixed-size chunks.
+
+    Args:
+        path: Path of the file to encode.
+        mime_type: MIME type to put in the data URL.
+        chunk_size: Bytes read per chunk; must be a multiple of 3.
+
+    Returns:
+        The data URL, e.g. "data:image/png;base64,...".
+    """
+    parts = []
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            parts.append(base64.b64encode(chunk))
+    return f"data:{mime_type};base64," + b"".join(parts).decode("ascii")
+
+
+def guess_image_mime_type(filename: str) -> str:
+    """Guess an image MIME type from its extension (PNG, otherwise JPEG)."""
+    return "image/png" if filename.lower().endswith(".png") else "image/jpeg"
+
+
+def decode_data_url(url: str) -> Optional[Tuple[str, bytes]]:
+    """
+    Decode a base64 data URL.
+
+    Returns:
+        (mime_type, bytes), or None if url isn't a base64 data URL.
+    """
+    if not url.startswith("data:"):
+        return None
+    header, _, data = url.partition(",")
+    if not header.endswith(";base64"):
+        return None
+    try:
+        return header[len("data:"):-len(";base64")], base64.b64decode(data, validate=True)
+    except ValueError:
+        return None
@@ -0,0 +1,35 @@
+"""
+JSON encoding with orjson when it is installed, stdlib json otherwise.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value):
+    """Serialize Reflex state proxies as the objects they wrap"""
+    wrapped = getattr(value, "__wrapped__", None)
+    if wrapped is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return wrapped
+
+
+def dumps(value) -> bytes:
+    """Encode value as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(
+        value, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data):
+    """Decode JSON from bytes, memoryview or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)